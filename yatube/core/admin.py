@@ -0,0 +1,26 @@
+from django.db.models import Q
+
+# Больше любого символа, который встретится в строке.
+MAX_CHAR = '\U0010ffff'
+
+
+class PrefixSearchMixin:
+    """Поиск в админке по началу значения полей prefix_search_fields.
+
+    Стандартный поиск по search_fields - LIKE '%...%', полный проход по
+    таблице. Здесь каждое поле сравнивается диапазоном
+    field >= q AND field < q + MAX_CHAR, который идет по индексу поля.
+    Поиск чувствителен к регистру, как и индекс. Этот же поиск
+    используют виджеты autocomplete_fields.
+    """
+    prefix_search_fields = ()
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        condition = Q()
+        for field in self.prefix_search_fields:
+            condition |= Q(**{f'{field}__gte': term,
+                              f'{field}__lt': term + MAX_CHAR})
+        return queryset.filter(condition), False
@@ -0,0 +1,21 @@
+"""Общее для команд-бенчмарков (bench_sqlite, bench_views)."""
+
+
+def percentiles(values, *points):
+    """Перцентили points (от 0 до 100) выборки values в тех же единицах.
+
+    Линейная интерполяция между соседними значениями отсортированной
+    выборки. statistics.quantiles не подходит: его нет в Python 3.7.
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return [0] * len(points)
+    last = len(ordered) - 1
+    result = []
+    for point in points:
+        position = last * point / 100
+        lower = int(position)
+        upper = min(lower + 1, last)
+        result.append(ordered[lower]
+                      + (ordered[upper] - ordered[lower]) * (position - lower))
+    return result
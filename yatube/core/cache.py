@@ -0,0 +1,262 @@
+"""Бэкенд кэша в файле SQLite, общий для всех процессов на хосте.
+
+В отличие от LocMemCache, каждый WSGI-воркер видит одни и те же записи,
+поэтому попадания не падают с ростом числа воркеров, а сброс поколений
+(posts/cache.py) в одном процессе сразу виден остальным. Файл открывается
+в режиме WAL с отображением в память, чтение не блокирует запись.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.SQLiteCache',
+            'LOCATION': '/var/tmp/yatube/cache.sqlite3',
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }
+    }
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+)
+INT64 = range(-2 ** 63, 2 ** 63)
+# Не больше параметров в одном IN (...), чем разрешает любая сборка SQLite.
+CHUNK_SIZE = 500
+
+
+def _dump(value):
+    # Целые храним как INTEGER, чтобы incr() выполнялся одним UPDATE.
+    if type(value) is int and value in INT64:
+        return value
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def _load(value):
+    if isinstance(value, int):
+        return value
+    return pickle.loads(value)
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite с вытеснением давно не читавшихся записей.
+
+    OPTIONS:
+        MAX_ENTRIES, CULL_FREQUENCY - как у встроенных бэкендов: при
+            переполнении удаляется 1/CULL_FREQUENCY самых старых записей;
+        LRU_RESOLUTION - время последнего чтения обновляется не чаще раза
+            в столько секунд, чтобы чтение почти не писало в файл;
+        MMAP_SIZE - сколько байт файла отображать в память;
+        BUSY_TIMEOUT - сколько секунд ждать блокировку записи.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._lru_resolution = float(options.get('LRU_RESOLUTION', 10))
+        self._mmap_size = int(options.get('MMAP_SIZE', 64 * 1024 * 1024))
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._local = threading.local()
+
+    @property
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self._path,
+                timeout=self._busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(f'PRAGMA mmap_size={self._mmap_size}')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _write(self):
+        """Транзакция, которая сразу берет блокировку записи."""
+        return _Transaction(self._connection)
+
+    def _fetch(self, keys):
+        now = time.time()
+        rows = []
+        for start in range(0, len(keys), CHUNK_SIZE):
+            chunk = keys[start:start + CHUNK_SIZE]
+            marks = ','.join('?' * len(chunk))
+            rows += self._connection.execute(
+                f'SELECT key, value, accessed FROM cache'
+                f' WHERE key IN ({marks})'
+                ' AND (expires IS NULL OR expires > ?)',
+                (*chunk, now),
+            ).fetchall()
+        stale = [key for key, _, accessed in rows
+                 if accessed < now - self._lru_resolution]
+        if stale:
+            self._touch_accessed(stale, now)
+        return {key: _load(value) for key, value, _ in rows}
+
+    def _touch_accessed(self, keys, now):
+        # Отметка для LRU не важна настолько, чтобы ждать блокировку записи:
+        # на время UPDATE ожидание выключено, занятый файл - пропуск.
+        connection = self._connection
+        connection.execute('PRAGMA busy_timeout = 0')
+        try:
+            for start in range(0, len(keys), CHUNK_SIZE):
+                chunk = keys[start:start + CHUNK_SIZE]
+                marks = ','.join('?' * len(chunk))
+                connection.execute(
+                    f'UPDATE cache SET accessed = ? WHERE key IN ({marks})',
+                    (now, *chunk),
+                )
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            connection.execute(
+                f'PRAGMA busy_timeout = {int(self._busy_timeout * 1000)}')
+
+    def _store(self, connection, items, timeout, mode='REPLACE'):
+        now = time.time()
+        expires = self.get_backend_timeout(timeout)
+        cursor = connection.executemany(
+            f'INSERT OR {mode} INTO cache (key, value, expires, accessed)'
+            ' VALUES (?, ?, ?, ?)',
+            [(key, _dump(value), expires, now)
+             for key, value in items],
+        )
+        self._cull(connection, now)
+        return cursor.rowcount
+
+    def _cull(self, connection, now):
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        connection.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries:
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache'
+                ' ORDER BY accessed LIMIT ?)',
+                (max(count // self._cull_frequency, 1),),
+            )
+
+    def _make_key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._make_key(key, version)
+        with self._write() as connection:
+            connection.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, time.time()),
+            )
+            return self._store(
+                connection, [(key, value)], timeout, mode='IGNORE') == 1
+
+    def get(self, key, default=None, version=None):
+        key = self._make_key(key, version)
+        return self._fetch([key]).get(key, default)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._make_key(key, version)
+        with self._write() as connection:
+            self._store(connection, [(key, value)], timeout)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._make_key(key, version)
+        with self._write() as connection:
+            cursor = connection.execute(
+                'UPDATE cache SET expires = ? WHERE key = ?'
+                ' AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), key, time.time()),
+            )
+            return cursor.rowcount == 1
+
+    def delete(self, key, version=None):
+        key = self._make_key(key, version)
+        with self._write() as connection:
+            cursor = connection.execute(
+                'DELETE FROM cache WHERE key = ?', (key,))
+            return cursor.rowcount == 1
+
+    def has_key(self, key, version=None):
+        key = self._make_key(key, version)
+        return self._connection.execute(
+            'SELECT 1 FROM cache WHERE key = ?'
+            ' AND (expires IS NULL OR expires > ?)',
+            (key, time.time()),
+        ).fetchone() is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self._make_key(key, version)
+        with self._write() as connection:
+            cursor = connection.execute(
+                'UPDATE cache SET value = value + ? WHERE key = ?'
+                " AND typeof(value) = 'integer'"
+                ' AND (expires IS NULL OR expires > ?)',
+                (delta, key, time.time()),
+            )
+            if cursor.rowcount != 1:
+                raise ValueError(f"Key '{key}' not found")
+            return connection.execute(
+                'SELECT value FROM cache WHERE key = ?', (key,)
+            ).fetchone()[0]
+
+    def get_many(self, keys, version=None):
+        keys = {self._make_key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        found = self._fetch(list(keys))
+        return {keys[key]: value for key, value in found.items()}
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        items = [(self._make_key(key, version), value)
+                 for key, value in data.items()]
+        with self._write() as connection:
+            self._store(connection, items, timeout)
+        return []
+
+    def delete_many(self, keys, version=None):
+        keys = [self._make_key(key, version) for key in keys]
+        with self._write() as connection:
+            for start in range(0, len(keys), CHUNK_SIZE):
+                chunk = keys[start:start + CHUNK_SIZE]
+                marks = ','.join('?' * len(chunk))
+                connection.execute(
+                    f'DELETE FROM cache WHERE key IN ({marks})', chunk)
+
+    def clear(self):
+        with self._write() as connection:
+            connection.execute('DELETE FROM cache')
+
+
+class _Transaction:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+        return self.connection
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.connection.execute('ROLLBACK' if exc_type else 'COMMIT')
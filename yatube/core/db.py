@@ -0,0 +1,74 @@
+"""Настройка соединений SQLite при открытии.
+
+Django открывает соединение на каждый запрос (CONN_MAX_AGE = 0), а
+параметры SQLite, кроме journal_mode, живут только в соединении, поэтому
+их выставляет обработчик connection_created. Набор берется из
+SQLITE_PRAGMAS:
+
+    journal_mode=WAL     читатели не ждут писателя, писатель - читателей;
+    synchronous=NORMAL   в WAL не теряет целостность, fsync только на
+                         контрольных точках;
+    mmap_size            чтение страниц файла без копирования;
+    cache_size           кэш страниц соединения (отрицательное - в КиБ);
+    temp_store=MEMORY    временные таблицы сортировок в памяти;
+    busy_timeout         сколько мс ждать блокировку, а не сразу падать
+                         с «database is locked».
+
+Раз в SQLITE_OPTIMIZE_INTERVAL секунд процесс выполняет PRAGMA optimize
+с ограничением analysis_limit: SQLite сам решает, каким таблицам нужна
+свежая статистика для планировщика.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# Флаг 0x10000 (проверять все таблицы, а не только прочитанные этим
+# соединением) понимает SQLite 3.46+, более старые его игнорируют.
+OPTIMIZE = 'PRAGMA optimize = 0x10002'
+
+# Не больше параметров в одном запросе, чем разрешает любая сборка SQLite:
+# до 3.32 предел - 999.
+MAX_VARIABLES = 999
+
+_optimize_lock = threading.Lock()
+_last_optimize = 0.0
+
+
+def _optimize_due():
+    global _last_optimize
+    interval = settings.SQLITE_OPTIMIZE_INTERVAL
+    if interval is None:
+        return False
+    with _optimize_lock:
+        now = time.monotonic()
+        if _last_optimize and now - _last_optimize < interval:
+            return False
+        _last_optimize = now
+        return True
+
+
+def apply_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor, settings.SQLITE_PRAGMAS)
+        if _optimize_due():
+            cursor.execute(
+                f'PRAGMA analysis_limit = {settings.SQLITE_ANALYSIS_LIMIT}')
+            cursor.execute(OPTIMIZE)
+
+
+def chunks(values, size=MAX_VARIABLES):
+    """Куски списка values не длиннее size - для IN (...) и VALUES."""
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
@@ -0,0 +1,66 @@
+import shutil
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache import SQLiteCache
+
+BATCH_SIZE = 10
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает скорость SQLiteCache с LocMemCache '
+            'и FileBasedCache на одинаковых операциях.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keys', type=int, default=2000,
+                            help='Сколько разных ключей использовать.')
+        parser.add_argument('--value-size', type=int, default=2048,
+                            help='Размер значения в байтах.')
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp()
+        params = {'OPTIONS': {'MAX_ENTRIES': options['keys'] * 2}}
+        backends = {
+            'LocMemCache': LocMemCache('bench', params),
+            'FileBasedCache': FileBasedCache(f'{directory}/files', params),
+            'SQLiteCache': SQLiteCache(f'{directory}/cache.sqlite3', params),
+        }
+        try:
+            self.stdout.write(
+                f'{"backend":<16}{"set/s":>10}{"get/s":>10}'
+                f'{"get_many/s":>12}{"incr/s":>10}'
+            )
+            for name, backend in backends.items():
+                rates = self.measure(backend, options['keys'],
+                                     b'x' * options['value_size'])
+                self.stdout.write(
+                    f'{name:<16}{rates[0]:>10.0f}{rates[1]:>10.0f}'
+                    f'{rates[2]:>12.0f}{rates[3]:>10.0f}'
+                )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def measure(self, backend, count, value):
+        keys = [f'key:{i}' for i in range(count)]
+        batches = [keys[i:i + BATCH_SIZE]
+                   for i in range(0, count, BATCH_SIZE)]
+        backend.set('counter', 0)
+        return (
+            self.rate(count, lambda: [backend.set(key, value)
+                                      for key in keys]),
+            self.rate(count, lambda: [backend.get(key) for key in keys]),
+            self.rate(len(batches), lambda: [backend.get_many(batch)
+                                             for batch in batches]),
+            self.rate(count, lambda: [backend.incr('counter')
+                                      for _ in keys]),
+        )
+
+    @staticmethod
+    def rate(operations, run):
+        start = time.perf_counter()
+        run()
+        return operations / (time.perf_counter() - start)
@@ -0,0 +1,154 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.bench import percentiles
+from core.db import apply_pragmas
+
+SCHEMA = (
+    'CREATE TABLE post (id INTEGER PRIMARY KEY, author_id INTEGER, '
+    'text TEXT, pub_date REAL, comment_count INTEGER NOT NULL DEFAULT 0)',
+    'CREATE INDEX post_pub_date ON post (pub_date, id)',
+    'CREATE TABLE comment (id INTEGER PRIMARY KEY, post_id INTEGER, '
+    'text TEXT, pub_date REAL)',
+    'CREATE INDEX comment_post ON comment (post_id, pub_date, id)',
+)
+TEXT = 'Пост для проверки блокировок SQLite. ' * 8
+
+
+class Worker(threading.Thread):
+    """Поток со своим соединением: читает ленту или пишет комментарии."""
+
+    def __init__(self, path, pragmas, writer, deadline, posts, seed):
+        super().__init__()
+        self.path = path
+        self.pragmas = pragmas
+        self.writer = writer
+        self.deadline = deadline
+        self.posts = posts
+        self.random = random.Random(seed)
+        self.latencies = []
+        self.errors = 0
+
+    def run(self):
+        # Так соединение открывает Django: автокоммит, timeout 5 с.
+        connection = sqlite3.connect(self.path, timeout=5,
+                                     isolation_level=None,
+                                     check_same_thread=False)
+        cursor = connection.cursor()
+        apply_pragmas(cursor, self.pragmas)
+        operation = self.write if self.writer else self.read
+        while time.monotonic() < self.deadline:
+            started = time.perf_counter()
+            try:
+                operation(cursor)
+            except sqlite3.OperationalError:
+                # database is locked: ожидание дольше timeout.
+                self.errors += 1
+                if connection.in_transaction:
+                    cursor.execute('ROLLBACK')
+                continue
+            self.latencies.append(time.perf_counter() - started)
+        connection.close()
+
+    def read(self, cursor):
+        """Страница ленты и число комментариев поста, как post_detail."""
+        cursor.execute(
+            'SELECT id, text FROM post ORDER BY pub_date DESC, id DESC '
+            'LIMIT 10 OFFSET ?', [self.random.randrange(100)])
+        cursor.fetchall()
+        cursor.execute(
+            'SELECT id, text FROM comment WHERE post_id = ? '
+            'ORDER BY pub_date DESC, id DESC LIMIT 20',
+            [self.random.randrange(1, self.posts + 1)])
+        cursor.fetchall()
+
+    def write(self, cursor):
+        """Комментарий и счетчик поста в одной транзакции, как add_comment."""
+        post = self.random.randrange(1, self.posts + 1)
+        # get_object_or_404 выполняется до транзакции.
+        cursor.execute('SELECT id FROM post WHERE id = ?', [post])
+        cursor.execute('BEGIN')
+        cursor.execute(
+            'INSERT INTO comment (post_id, text, pub_date) VALUES (?, ?, ?)',
+            [post, 'Комментарий', time.time()])
+        cursor.execute(
+            'UPDATE post SET comment_count = comment_count + 1 '
+            'WHERE id = ?', [post])
+        cursor.execute('COMMIT')
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает SQLite с настройками по умолчанию (журнал отката) '
+            'и с SQLITE_PRAGMAS под смешанной нагрузкой: потоки читают '
+            'ленту и одновременно пишут комментарии. Данные создаются во '
+            'временном файле.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=16)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--posts', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        modes = {
+            'по умолчанию': {'journal_mode': 'DELETE'},
+            'SQLITE_PRAGMAS': settings.SQLITE_PRAGMAS,
+        }
+        self.stdout.write(
+            f'{"режим":<16}{"чтений/с":>10}{"записей/с":>11}'
+            f'{"чтение p50":>12}{"p95":>9}{"p99":>9}{"запись p95":>12}'
+            f'{"locked (чт/зап)":>17}')
+        for label, pragmas in modes.items():
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                self.create(path, options['posts'])
+                readers, writers = self.load(path, pragmas, options)
+            reads = [value for worker in readers
+                     for value in worker.latencies]
+            writes = [value for worker in writers
+                      for value in worker.latencies]
+            errors = (sum(worker.errors for worker in readers),
+                      sum(worker.errors for worker in writers))
+            read_ms = [value * 1000 for value in percentiles(
+                reads, 50, 95, 99)]
+            write_ms = [value * 1000 for value in percentiles(
+                writes, 50, 95, 99)]
+            self.stdout.write(
+                f'{label:<16}{len(reads) / options["seconds"]:>10.0f}'
+                f'{len(writes) / options["seconds"]:>11.0f}'
+                f'{read_ms[0]:>10.2f}мс{read_ms[1]:>7.2f}мс'
+                f'{read_ms[2]:>7.2f}мс{write_ms[1]:>10.2f}мс'
+                f'{errors[0]:>10}/{errors[1]}')
+
+    @staticmethod
+    def create(path, posts):
+        connection = sqlite3.connect(path)
+        with connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+            now = time.time()
+            connection.executemany(
+                'INSERT INTO post (author_id, text, pub_date) '
+                'VALUES (?, ?, ?)',
+                ((i % 100, TEXT, now - i) for i in range(posts)))
+        connection.close()
+
+    @staticmethod
+    def load(path, pragmas, options):
+        deadline = time.monotonic() + options['seconds']
+        readers = [Worker(path, pragmas, False, deadline, options['posts'],
+                          seed) for seed in range(options['readers'])]
+        writers = [Worker(path, pragmas, True, deadline, options['posts'],
+                          -seed - 1) for seed in range(options['writers'])]
+        for worker in readers + writers:
+            worker.start()
+        for worker in readers + writers:
+            worker.join()
+        return readers, writers
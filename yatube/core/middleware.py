@@ -0,0 +1,53 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCounter:
+    """Обертка execute_wrapper: считает запросы к БД и их общее время."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+class QueryCountMiddleware:
+    """Считает запросы к БД за время обработки запроса.
+
+    Итог пишется в лог, а при QUERY_COUNT_HEADERS еще и в заголовки
+    X-Query-Count и X-Query-Time (миллисекунды). Запросы дороже
+    QUERY_COUNT_WARNING запросов попадают в лог с уровнем WARNING.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        duration = counter.duration * 1000
+        level = (logging.WARNING
+                 if counter.count > settings.QUERY_COUNT_WARNING
+                 else logging.DEBUG)
+        logger.log(level, '%s %s: %d queries in %.1f ms',
+                   request.method, request.path, counter.count, duration)
+        if settings.QUERY_COUNT_HEADERS:
+            response['X-Query-Count'] = counter.count
+            response['X-Query-Time'] = f'{duration:.1f}'
+        return response
@@ -0,0 +1,36 @@
+"""Запуск тестов с отдельным кэшем.
+
+Тесты не должны чистить и читать кэш запущенного рядом сервера и других
+прогонов: у каждого прогона свой кэш в памяти. Сам SQLiteCache проверяют
+тесты core/tests.py на временных файлах.
+"""
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tests',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    }
+}
+
+
+def use_test_caches():
+    """override_settings с кэшем тестов; pytest включает его в conftest."""
+    return override_settings(CACHES=TEST_CACHES)
+
+
+class TestRunner(DiscoverRunner):
+    """DiscoverRunner, у которого кэш на время прогона - TEST_CACHES."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.caches = use_test_caches()
+        self.caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.caches.disable()
+        super().teardown_test_environment(**kwargs)
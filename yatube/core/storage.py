@@ -0,0 +1,72 @@
+"""Хранилище файлов с именами по содержимому.
+
+Файл сохраняется как <каталог>/ab/cd/<sha256>.<расширение>, где ab и cd -
+первые символы хеша: одинаковые загрузки получают одно имя и хранятся
+один раз, sorl создает для них одни и те же миниатюры, а в одном каталоге
+не бывает больше нескольких сотен файлов даже при миллионах картинок
+(так же sorl раскладывает и сами миниатюры). Удалять такой файл можно,
+только если на него больше никто не ссылается, - это проверяет вызывающий
+код (posts/media.py).
+"""
+import hashlib
+import os
+import re
+import time
+import uuid
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASHED_NAME = re.compile(r'^[0-9a-f]{64}\.')
+
+
+def is_hashed(name):
+    """Имя уже задано содержимым файла (без учета раскладки)."""
+    return bool(HASHED_NAME.match(os.path.basename(name)))
+
+
+def shard(name):
+    """posts/abcd....jpg -> posts/ab/cd/abcd....jpg."""
+    directory, filename = os.path.split(name)
+    return os.path.join(directory, filename[:2], filename[2:4], filename)
+
+
+def is_sharded(name):
+    parts = name.split('/')
+    filename = parts[-1]
+    return len(parts) >= 3 and parts[-3:-1] == [filename[:2], filename[2:4]]
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def hashed_name(self, name, content):
+        """Имя файла по sha256 содержимого в каталоге исходного имени."""
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return shard(os.path.join(directory, digest.hexdigest() + extension))
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            # Отметка времени говорит удалению, что файл снова нужен.
+            os.utime(self.path(name))
+            return name
+        # Пишем во временное имя и атомарно переименовываем: два
+        # одновременных сохранения одного содержимого не создадут копию
+        # с суффиксом, а читатель не увидит недописанный файл.
+        temporary = super().save(f'{name}.{uuid.uuid4().hex}.tmp', content)
+        os.replace(self.path(temporary), self.path(name))
+        return name
+
+    def modified_ago(self, name):
+        """Сколько секунд назад файл сохраняли или загружали повторно."""
+        return time.time() - os.path.getmtime(self.path(name))
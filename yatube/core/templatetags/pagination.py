@@ -0,0 +1,24 @@
+from django import template
+from django.conf import settings
+
+register = template.Library()
+
+
+@register.filter
+def page_window(page_obj, size=None):
+    """Номера страниц вокруг текущей вместо всего page_range."""
+    size = settings.PAGINATOR_WINDOW if size is None else int(size)
+    start = max(page_obj.number - size, 1)
+    end = min(page_obj.number + size, page_obj.paginator.num_pages)
+    return range(start, end + 1)
+
+
+@register.simple_tag(takes_context=True)
+def page_query(context, **params):
+    """Строка запроса ссылки пагинатора: прочие параметры (например, q
+    поиска) сохраняются, параметры страницы заменяются на params."""
+    query = context['request'].GET.copy()
+    for key in ('page', 'after', 'before'):
+        query.pop(key, None)
+    query.update(params)
+    return '?' + query.urlencode()
@@ -0,0 +1,133 @@
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from . import db
+from .bench import percentiles
+from .cache import SQLiteCache
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = f'{self.directory}/cache.sqlite3'
+        self.cache = SQLiteCache(self.location, {})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_values_survive_round_trip(self):
+        """Значения любых типов читаются такими же, какими записаны."""
+        values = {'int': 7, 'big': 2 ** 70, 'bool': True, 'text': 'пост',
+                  'list': [1, 'a', None]}
+        self.cache.set_many(values)
+        self.assertEqual(self.cache.get_many(list(values) + ['нет']),
+                         values)
+        self.assertIs(self.cache.get('bool'), True)
+
+    def test_shared_between_instances(self):
+        """Второй экземпляр на том же файле видит записи первого."""
+        other = SQLiteCache(self.location, {})
+        self.cache.set('key', 'value')
+        self.assertEqual(other.get('key'), 'value')
+        other.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_expiry_and_add(self):
+        """add() не перетирает живую запись, но заменяет истекшую."""
+        self.assertTrue(self.cache.add('key', 1, 0.05))
+        self.assertFalse(self.cache.add('key', 2))
+        time.sleep(0.1)
+        self.assertFalse(self.cache.has_key('key'))
+        self.assertTrue(self.cache.add('key', 3))
+        self.assertEqual(self.cache.get('key'), 3)
+
+    def test_incr_is_atomic(self):
+        """incr() из нескольких потоков не теряет приращений."""
+        self.cache.set('counter', 0)
+
+        def work():
+            for _ in range(50):
+                self.cache.incr('counter')
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_lru_eviction(self):
+        """При переполнении вытесняются давно не читавшиеся записи."""
+        cache = SQLiteCache(self.location, {'OPTIONS': {
+            'MAX_ENTRIES': 4, 'CULL_FREQUENCY': 2, 'LRU_RESOLUTION': 0,
+        }})
+        for i in range(4):
+            cache.set(i, i)
+            time.sleep(0.01)
+        cache.get(0)
+        cache.set(4, 4)
+        self.assertEqual(set(cache.get_many(range(5))), {0, 3, 4})
+
+    def test_get_does_not_wait_for_writer(self):
+        """Чтение не ждет чужую запись ради отметки LRU."""
+        cache = SQLiteCache(self.location, {'OPTIONS': {
+            'LRU_RESOLUTION': 0, 'BUSY_TIMEOUT': 5,
+        }})
+        cache.set('key', 'value')
+        writer = sqlite3.connect(self.location, isolation_level=None)
+        writer.execute('BEGIN IMMEDIATE')
+        try:
+            started = time.monotonic()
+            self.assertEqual(cache.get('key'), 'value')
+            self.assertLess(time.monotonic() - started, 1)
+        finally:
+            writer.rollback()
+            writer.close()
+        busy_timeout, = cache._connection.execute(
+            'PRAGMA busy_timeout').fetchone()
+        self.assertEqual(busy_timeout, 5000)
+
+
+class SQLitePragmaTests(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    @override_settings(SQLITE_OPTIMIZE_INTERVAL=None)
+    def test_pragmas_applied_on_connect(self):
+        """Новое соединение получает параметры из SQLITE_PRAGMAS."""
+        pragmas = {'cache_size': -1234, 'busy_timeout': 4321,
+                   'temp_store': 'MEMORY'}
+        with override_settings(SQLITE_PRAGMAS=pragmas):
+            db.configure_sqlite(sender=None, connection=connection)
+        self.assertEqual(self.pragma('cache_size'), -1234)
+        self.assertEqual(self.pragma('busy_timeout'), 4321)
+        self.assertEqual(self.pragma('temp_store'), 2)
+
+    def test_optimize_runs_once_per_interval(self):
+        """PRAGMA optimize выполняется не чаще SQLITE_OPTIMIZE_INTERVAL."""
+        db._last_optimize = 0.0
+        with override_settings(SQLITE_OPTIMIZE_INTERVAL=3600):
+            self.assertTrue(db._optimize_due())
+            self.assertFalse(db._optimize_due())
+        with override_settings(SQLITE_OPTIMIZE_INTERVAL=0):
+            self.assertTrue(db._optimize_due())
+
+
+class PercentilesTests(SimpleTestCase):
+    def test_interpolates_sorted_samples(self):
+        """Перцентили считаются по отсортированной выборке."""
+        self.assertEqual(percentiles([4, 1, 3, 2, 5], 0, 50, 100),
+                         [1, 3, 5])
+        self.assertEqual(percentiles(range(101), 95, 99), [95, 99])
+        self.assertEqual(percentiles([1, 2], 50), [1.5])
+        self.assertEqual(percentiles([], 50, 99), [0, 0])
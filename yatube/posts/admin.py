@@ -1,6 +1,112 @@
+from functools import partial
+
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.db.models.functions import Substr
+from django.forms.utils import flatatt
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+from django.utils.text import Truncator
+
+from core.admin import PrefixSearchMixin
 
 from .models import Comment, Follow, Group, Post
+from .search import filter_matching
+from .utils import CachedCountPaginator
+
+PREVIEW_LENGTH = 80
+
+
+class SharedChoices:
+    """Варианты выбора, которые читаются из БД при первом обходе и
+    дальше общие для всех копий поля и виджета."""
+
+    def __init__(self, choices):
+        self.choices = choices
+        self.items = None
+        self.options_html = None
+
+    def __iter__(self):
+        if self.items is None:
+            # iter(): list() спросил бы len() и сделал лишний COUNT(*).
+            self.items = list(iter(self.choices))
+        return iter(self.items)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class SharedSelect(forms.Select):
+    """Select, который строит <option> один раз на все строки списка.
+
+    Шаблон виджета рендерит каждый вариант отдельно: сотня строк по сотне
+    групп - десять тысяч шаблонов на страницу. Здесь разметка вариантов
+    общая, а в каждой строке отмечается только выбранный.
+    """
+
+    def render(self, name, value, attrs=None, renderer=None):
+        choices = self.choices
+        if not isinstance(choices, SharedChoices):
+            return super().render(name, value, attrs, renderer)
+        if choices.options_html is None:
+            choices.options_html = format_html_join(
+                '', '<option value="{}">{}</option>', choices)
+        value = '' if value is None else str(value)
+        option = format_html('<option value="{}">', value)
+        options = choices.options_html.replace(
+            option, option[:-1] + ' selected>', 1)
+        return format_html(
+            '<select name="{}"{}>{}</select>', name,
+            flatatt(self.build_attrs(self.attrs, attrs)), mark_safe(options))
+
+
+class SharedChoicesField(forms.ModelChoiceField):
+    """ModelChoiceField, который выбирает варианты из БД один раз.
+
+    Формы строк списка копируют поле, а вместе с ним и общий список,
+    поэтому list_editable не делает по запросу на каждую строку.
+    """
+    widget = SharedSelect
+
+    def _get_choices(self):
+        if hasattr(self, '_choices'):
+            return self._choices
+        if '_shared_choices' not in self.__dict__:
+            self._shared_choices = SharedChoices(super()._get_choices())
+        return self._shared_choices
+
+    choices = property(_get_choices, forms.ChoiceField._set_choices)
+
+
+class AdminPaginator(CachedCountPaginator):
+    """CachedCountPaginator для списков с list_editable.
+
+    Формсет списка ждет QuerySet, а не список строк, поэтому страница
+    отдается срезом выборки с уже прочитанными строками: второго запроса
+    за теми же постами не будет.
+    """
+
+    def page(self, number):
+        page = super().page(number)
+        bottom = (page.number - 1) * self.per_page
+        object_list = self.object_list[bottom:bottom + self.per_page]
+        object_list._result_cache = page.object_list
+        page.object_list = object_list
+        return page
+
+
+class PostChangeList(ChangeList):
+    def get_queryset(self, request):
+        # Списку хватает начала текста: посты целиком из БД не читаются.
+        return super().get_queryset(request).defer('text').annotate(
+            text_preview=Substr('text', 1, PREVIEW_LENGTH + 1))
 
 
 @admin.register(Post)
@@ -13,18 +119,58 @@ class PostAdmin(admin.ModelAdmin):
         'group',
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    autocomplete_fields = ('author', 'group')
     search_fields = ('text',)
+    # Фильтр по дате - диапазон pub_date, как и сортировка по
+    # (pub_date, id), идет по индексу post_pub_date_id_idx.
     list_filter = ('pub_date',)
+    ordering = ('-pub_date', '-id')
+    paginator = AdminPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто-'
 
+    def get_changelist(self, request, **kwargs):
+        return PostChangeList
+
+    def get_list_display(self, request):
+        # Вместо текста целиком - его начало из text_preview.
+        return tuple('short_text' if name == 'text' else name
+                     for name in super().get_list_display(request))
+
+    def short_text(self, obj):
+        return Truncator(obj.text_preview).chars(PREVIEW_LENGTH)
+    short_text.short_description = 'Текст поста'
+
+    def get_changelist_formset(self, request, **kwargs):
+        kwargs['formfield_callback'] = partial(
+            self.changelist_formfield, request=request)
+        return super().get_changelist_formset(request, **kwargs)
+
+    def changelist_formfield(self, db_field, request, **kwargs):
+        # В строках списка autocomplete делал бы по запросу на строку, а
+        # групп немного: там обычный select с общими вариантами.
+        if db_field.name == 'group':
+            return db_field.formfield(form_class=SharedChoicesField, **kwargs)
+        return self.formfield_for_dbfield(db_field, request, **kwargs)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по индексу FTS5 вместо LIKE '%...%' по всей таблице.
+        if not search_term.strip():
+            return queryset, False
+        return filter_matching(queryset, search_term), False
+
 
 @admin.register(Group)
-class GroupAdmin(admin.ModelAdmin):
+class GroupAdmin(PrefixSearchMixin, admin.ModelAdmin):
     list_display = (
         'title',
         'slug',
         'description',
     )
+    search_fields = ('title', 'slug')
+    prefix_search_fields = ('title', 'slug')
+    ordering = ('title',)
     prepopulated_fields = {'slug': ('title',), }
     empty_value_display = '-пусто-'
 
@@ -37,6 +183,8 @@ class CommentAdmin(admin.ModelAdmin):
         'author',
         'text',
     )
+    list_select_related = ('post', 'author')
+    autocomplete_fields = ('post', 'author')
     empty_value_display = '-пусто-'
 
 
@@ -46,4 +194,6 @@ class FollowAdmin(admin.ModelAdmin):
         'user',
         'author',
     )
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
     empty_value_display = '-пусто-'
@@ -0,0 +1,143 @@
+"""JSON-версии лент и страницы поста для клиентов, которым не нужен HTML.
+
+Ответы поддерживают условные GET (conditional_page из posts/cache.py):
+ETag строится из поколений кэша тех же пространств имен, что и у
+HTML-лент, а Last-Modified - время самого нового поста страницы. Оба
+значения берутся из кэша, поэтому ответ 304 отдается без запроса за
+постами страницы.
+"""
+from functools import wraps
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET
+
+from .cache import (conditional_page, group_id_key, set_last_modified,
+                    user_id_key)
+from .feed import follow_feed
+from .models import Group, Post
+from .utils import CursorPaginator
+from .views import NUMBER_OF_POSTS, _lookup, _post_namespaces, comments_page
+
+User = get_user_model()
+
+# Меняется вместе с форматом ответа: старые ETag перестают совпадать.
+API_VERSION = 1
+
+
+def conditional_json(namespaces):
+    """Декоратор JSON-представлений с ETag и Last-Modified.
+
+    Представление возвращает (данные, время последнего изменения) и
+    вызывается, только если у клиента нет актуальной копии.
+    """
+    def decorator(view):
+        @require_GET
+        @conditional_page(namespaces, version=f'api{API_VERSION}')
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            data, modified = view(request, *args, **kwargs)
+            response = JsonResponse(
+                data, json_dumps_params={'ensure_ascii': False})
+            return set_last_modified(response, filter(None, [modified]))
+        return wrapper
+    return decorator
+
+
+def user_data(user):
+    return {'username': user.username, 'full_name': user.get_full_name()}
+
+
+def post_data(post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'author': user_data(post.author),
+        'group': post.group and {'slug': post.group.slug,
+                                 'title': post.group.title},
+        'image': post.image.url if post.image else None,
+    }
+
+
+def page_links(request, page):
+    links = {'next': None, 'previous': None}
+    if page.has_next():
+        links['next'] = f'{request.path}?after={page.next_cursor}'
+    if page.has_previous():
+        links['previous'] = f'{request.path}?before={page.previous_cursor}'
+    return links
+
+
+def feed_response(request, queryset):
+    page = CursorPaginator(queryset, NUMBER_OF_POSTS).get_page(
+        after=request.GET.get('after'), before=request.GET.get('before'))
+    data = {'results': [post_data(post) for post in page],
+            **page_links(request, page)}
+    modified = max((post.pub_date for post in page), default=None)
+    return data, modified
+
+
+def _group_namespaces(request, slug):
+    # Тот же запомненный id, что и у HTML-страницы группы: ответ 304
+    # отдается без запросов к БД.
+    group_id = _lookup(group_id_key(slug), Group.objects.filter(
+        slug=slug).values_list('pk', flat=True))
+    if group_id is None:
+        raise Http404
+    return [f'group:{group_id}']
+
+
+def _author_namespaces(request, username):
+    author_id = _lookup(user_id_key(username), User.objects.filter(
+        username=username).values_list('pk', flat=True))
+    if author_id is None:
+        raise Http404
+    return [f'author:{author_id}']
+
+
+@conditional_json(lambda request: ['index'])
+def index(request):
+    return feed_response(request, Post.objects.feed())
+
+
+@conditional_json(_group_namespaces)
+def group_posts(request, slug):
+    return feed_response(
+        request, Post.objects.feed().filter(group__slug=slug))
+
+
+@conditional_json(_author_namespaces)
+def profile(request, username):
+    return feed_response(
+        request, Post.objects.feed().filter(author__username=username))
+
+
+@login_required
+@conditional_json(
+    lambda request: [f'follow:{request.user.pk}', 'index'])
+def follow_index(request):
+    return feed_response(request, follow_feed(request.user).feed())
+
+
+# Автор поста входит в пространства имен: в ответе его имя.
+@conditional_json(_post_namespaces)
+def post_detail(request, post_id):
+    post = get_object_or_404(Post.objects.with_relations(), id=post_id)
+    comments = comments_page(request, post_id)
+    data = post_data(post)
+    data.update(
+        comment_count=post.comment_count,
+        comments=[{
+            'id': comment.pk,
+            'text': comment.text,
+            'pub_date': comment.pub_date.isoformat(),
+            'author': user_data(comment.author),
+        } for comment in comments],
+        next=(f'{request.path}?after={comments.next_cursor}'
+              if comments.has_next() else None),
+    )
+    modified = max([post.pub_date, *(c.pub_date for c in comments)])
+    return data, modified
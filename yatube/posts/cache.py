@@ -0,0 +1,138 @@
+"""Поколения кэша для лент.
+
+У каждой ленты свое пространство имен ('index', 'group:<id>',
+'author:<id>', 'follow:<user_id>', 'followers:<user_id>', 'post:<id>')
+со счетчиком поколения. Номер поколения входит в ключ закэшированного
+фрагмента, поэтому изменение данных не удаляет старые фрагменты, а делает
+их недостижимыми. Из тех же поколений строятся ETag условных ответов
+(conditional_page).
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+PAGE_PARAMS = ('page', 'after', 'before')
+
+
+def _key(namespace):
+    return f'generation:{namespace}'
+
+
+def generation(namespace):
+    """Текущее поколение пространства имен."""
+    key = _key(namespace)
+    value = cache.get(key)
+    if value is None:
+        # Счетчик стартует со времени: если ключ вытеснили из кэша,
+        # старые фрагменты не станут снова актуальными.
+        cache.add(key, time.time_ns(), None)
+        value = cache.get(key)
+    return value
+
+
+def bump(*namespaces):
+    """Начинает новое поколение для каждого пространства имен."""
+    for namespace in namespaces:
+        try:
+            cache.incr(_key(namespace))
+        except ValueError:
+            cache.set(_key(namespace), time.time_ns(), None)
+
+
+def feed_cache(request, *namespaces):
+    """Ключ и время жизни фрагмента ленты для тега {% cache %}.
+
+    Все ленты кэшируют фрагмент под одним именем, поэтому в ключе стоят
+    сами пространства имен, а не только номера поколений: у двух групп
+    поколения могут совпасть.
+    """
+    generations = ':'.join(f'{name}={generation(name)}'
+                           for name in namespaces)
+    page = '|'.join(request.GET.get(name, '') for name in PAGE_PARAMS)
+    return {
+        'key': f'{generations}|{page}',
+        'timeout': settings.FEED_CACHE_TIMEOUT,
+    }
+
+
+def post_author_key(post_id):
+    """Ключ кэша с автором поста для валидатора страницы поста."""
+    return f'post-author:{post_id}'
+
+
+def group_id_key(slug):
+    """Ключ кэша с id группы для валидатора страницы группы."""
+    return f'group-id:{slug}'
+
+
+def user_id_key(username):
+    """Ключ кэша с id пользователя для валидатора профиля."""
+    return f'user-id:{username}'
+
+
+def page_etag(request, namespaces, version=''):
+    """Сильный ETag страницы без запросов к БД.
+
+    Зависит от поколений namespaces, адреса, параметров страницы и
+    пользователя: анонимный и каждый вошедший пользователь видят разные
+    страницы (шапка, кнопки подписки и правки) и получают разные ETag.
+    version меняют вместе с форматом ответа, чтобы старые ETag перестали
+    совпадать.
+    """
+    generations = ':'.join(str(generation(name)) for name in namespaces)
+    page = '|'.join(request.GET.get(name, '') for name in PAGE_PARAMS)
+    user = request.user.pk if request.user.is_authenticated else 'anon'
+    raw = f'{version}|{request.path}|{generations}|{page}|{user}'
+    return quote_etag(hashlib.sha1(raw.encode()).hexdigest())
+
+
+def conditional_page(namespaces, version=''):
+    """Декоратор: ответ 304, пока не сменилось поколение namespaces.
+
+    namespaces(request, *args, **kwargs) возвращает пространства имен, от
+    которых зависит страница, или None, если условный ответ невозможен
+    (например, объекта нет - пусть представление отдаст 404). Проверка
+    идет до вызова представления, то есть без запросов за страницей и без
+    рендеринга шаблона. Last-Modified, выставленный представлением,
+    запоминается в кэше под ETag и проверяется так же.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            names = namespaces(request, *args, **kwargs)
+            if names is None:
+                return view(request, *args, **kwargs)
+            etag = page_etag(request, names, version)
+            modified_key = f'modified:{etag}'
+            last_modified = cache.get(modified_key)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                last_modified = parse_http_date_safe(
+                    response.get('Last-Modified', ''))
+                if last_modified:
+                    cache.set(modified_key, last_modified,
+                              settings.FEED_CACHE_TIMEOUT)
+            response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
+
+
+def set_last_modified(response, dates):
+    """Выставляет Last-Modified по самой поздней из dates."""
+    newest = max(dates, default=None)
+    if newest is not None:
+        response['Last-Modified'] = http_date(newest.timestamp())
+    return response
@@ -0,0 +1,75 @@
+"""Денормализованные счетчики постов, комментариев и подписок.
+
+Post.comment_count, Group.post_count и UserStats меняются сигналами
+(posts/signals.py) в той же транзакции, что и сама запись: сохранение
+моделей атомарно (AtomicSaveMixin), удаление Django и так выполняет в
+транзакции. Изменение - UPDATE ... SET n = n + 1, без чтения значения,
+поэтому параллельные записи не теряют приращения. Обычное сохранение
+модели столбцы-счетчики не пишет (CounterFieldsMixin), так что устаревшее
+значение в объекте не затирает текущее. Записи в обход модели
+(bulk_create, queryset.update, loaddata) счетчики не меняют: их
+пересчитывает команда recount_counters.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+
+
+def _add(queryset, field, delta):
+    if delta < 0:
+        # Запись, созданная в обход сигналов (bulk_create, loaddata,
+        # прерванный импорт), не учтена в счетчике: уменьшение ниже нуля
+        # нарушило бы CHECK столбца. Такой счетчик исправит recount.
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def change_user(user_id, field, delta):
+    """Меняет счетчик field пользователя на delta."""
+    if delta > 0:
+        # Строку создаем только при увеличении: при удалении пользователя
+        # каскадом она не должна появиться заново.
+        UserStats.objects.bulk_create([UserStats(user_id=user_id)],
+                                      ignore_conflicts=True)
+    _add(UserStats.objects.filter(pk=user_id), field, delta)
+
+
+def change_group(group_id, delta):
+    if group_id:
+        _add(Group.objects.filter(pk=group_id), 'post_count', delta)
+
+
+def change_comments(post_id, delta):
+    _add(Post.objects.filter(pk=post_id), 'comment_count', delta)
+
+
+def _count(queryset, field):
+    counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+        field).annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(counts), 0)
+
+
+def recount():
+    """Пересчитывает все счетчики по таблицам, по запросу на счетчик."""
+    last = 0
+    while True:
+        ids = list(User.objects.filter(pk__gt=last).order_by('pk')
+                   .values_list('pk', flat=True)[:BATCH_SIZE])
+        if not ids:
+            break
+        last = ids[-1]
+        UserStats.objects.bulk_create(
+            (UserStats(user_id=pk) for pk in ids), ignore_conflicts=True)
+    UserStats.objects.update(
+        posts_count=_count(Post.objects, 'author'),
+        followers_count=_count(Follow.objects, 'author'),
+        following_count=_count(Follow.objects, 'user'),
+    )
+    Group.objects.update(post_count=_count(Post.objects, 'group'))
+    Post.objects.update(comment_count=_count(Comment.objects, 'post'))
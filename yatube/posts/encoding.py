@@ -0,0 +1,43 @@
+"""Сжатие картинок в варианты миниатюр без БД и хранилища.
+
+Модуль не импортирует модели, поэтому его функции можно передавать в
+процессы пула, запущенные через spawn: процесс загружает модуль раньше,
+чем инициализатор успевает вызвать django.setup().
+"""
+from io import BytesIO
+
+import django
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.parsers import parse_geometry
+
+
+def setup_process():
+    """Инициализатор процессов пула: настройки sorl читаются из Django."""
+    django.setup()
+
+
+def encode_variants(data, variants):
+    """Сжимает исходник data во все варианты.
+
+    Работает только с байтами, без БД и хранилища, поэтому может
+    выполняться в другом процессе. Возвращает размер исходника и список
+    (байты, размер) в порядке variants.
+    """
+    engine = default.engine
+    image = engine.get_image(BytesIO(data))
+    image_info = engine.get_image_info(image)
+    results = []
+    for geometry_string, options in variants:
+        options = dict(default.backend.default_options, **options)
+        ratio = engine.get_image_ratio(image, options)
+        geometry = parse_geometry(geometry_string, ratio)
+        thumbnail = engine.create(image, geometry, options)
+        raw = engine._get_raw_data(
+            thumbnail, options['format'], options['quality'],
+            image_info=image_info,
+            progressive=options.get('progressive',
+                                    sorl_settings.THUMBNAIL_PROGRESSIVE),
+        )
+        results.append((raw, engine.get_image_size(thumbnail)))
+    return engine.get_image_size(image), results
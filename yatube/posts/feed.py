@@ -0,0 +1,205 @@
+"""Лента подписок: fan-out при записи и fan-in при чтении.
+
+Посты авторов, у которых подписчиков не больше FEED_FANOUT_THRESHOLD,
+раскладываются по FeedEntry подписчиков в момент публикации. Посты
+популярных авторов не раскладываются: они добавляются к ленте при
+чтении, чтобы один пост не порождал миллионы вставок. Кто из авторов
+читается через fan-in, записано в UserStats.fan_in. Флаги меняет запись:
+подписка и отписка (update_fan_in), импорт и команда sync_fan_in; автору,
+вышедшему из fan-in, ленты подписчиков дозаполняются.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Q
+
+from core.db import MAX_VARIABLES, chunks
+
+from .models import FeedEntry, Follow, Post, UserStats
+
+FAN_IN_AUTHORS_KEY = 'feed:fan-in-authors'
+
+
+def fan_in_authors():
+    """Множество id авторов, чьи посты читаются через fan-in.
+
+    Список общий для записи и чтения, поэтому оба пути одинаково решают,
+    раскладывать ли посты автора. Берется из флагов UserStats.fan_in и
+    кэшируется на FEED_FAN_IN_CACHE_TIMEOUT секунд; сами флаги меняет
+    только запись (update_fan_in, sync_fan_in).
+    """
+    authors = cache.get(FAN_IN_AUTHORS_KEY)
+    if authors is None:
+        authors = set(UserStats.objects.filter(fan_in=True).values_list(
+            'user_id', flat=True))
+        cache.set(FAN_IN_AUTHORS_KEY, authors,
+                  settings.FEED_FAN_IN_CACHE_TIMEOUT)
+    return authors
+
+
+def _set_fan_in(joined, left):
+    """Ставит и снимает флаги fan-in и дозаполняет ленты вышедших.
+
+    Пока автор в fan-in, его посты не попадают в FeedEntry. Вышедшему
+    автору (отписки, больший FEED_FANOUT_THRESHOLD) подписчики снова
+    читают ленту только из FeedEntry, поэтому им раскладываются его
+    последние посты.
+    """
+    if not joined and not left:
+        return
+    with transaction.atomic():
+        UserStats.objects.bulk_create(
+            (UserStats(user_id=pk) for pk in joined), ignore_conflicts=True)
+        for chunk in chunks(joined):
+            UserStats.objects.filter(pk__in=chunk).update(fan_in=True)
+        for chunk in chunks(left):
+            UserStats.objects.filter(pk__in=chunk).update(fan_in=False)
+        # Дозаполнение проверяет авторов по fan_in_authors(): список
+        # должен прочитать новые флаги. После фиксации его сбрасываем
+        # еще раз - другие процессы могли закэшировать старые флаги.
+        cache.delete(FAN_IN_AUTHORS_KEY)
+        for chunk in chunks(left):
+            backfill_follows(Follow.objects.filter(
+                author_id__in=chunk).only('user_id', 'author_id').iterator())
+        transaction.on_commit(lambda: cache.delete(FAN_IN_AUTHORS_KEY))
+
+
+def update_fan_in(author_id):
+    """Сверяет флаг fan-in автора с его счетчиком подписчиков.
+
+    Вызывается при подписке и отписке, после изменения счетчика.
+    """
+    followers, flagged = UserStats.objects.filter(pk=author_id).values_list(
+        'followers_count', 'fan_in').first() or (0, False)
+    popular = followers > settings.FEED_FANOUT_THRESHOLD
+    if popular != flagged:
+        _set_fan_in({author_id} if popular else set(),
+                    set() if popular else {author_id})
+
+
+def sync_fan_in(author_ids=None):
+    """Сверяет флаги fan-in с таблицей подписок.
+
+    Для записей в обход сигналов (импорт, наполнение базы) и после смены
+    FEED_FANOUT_THRESHOLD (команда sync_fan_in). author_ids ограничивает
+    сверку этими авторами; None - все авторы.
+    """
+    follows = Follow.objects.values('author').annotate(
+        followers=Count('pk')).filter(
+        followers__gt=settings.FEED_FANOUT_THRESHOLD).values_list(
+        'author', flat=True)
+    flagged = UserStats.objects.filter(fan_in=True).values_list(
+        'user_id', flat=True)
+    if author_ids is None:
+        popular, flagged = set(follows), set(flagged)
+    else:
+        popular, checked = set(), set()
+        for chunk in chunks(author_ids):
+            popular.update(follows.filter(author__in=chunk))
+            checked.update(flagged.filter(user_id__in=chunk))
+        flagged = checked
+    _set_fan_in(popular - flagged, flagged - popular)
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if post.author_id in fan_in_authors():
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, post=post, author_id=post.author_id,
+                   pub_date=post.pub_date)
+         for user_id in followers.iterator()),
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill_follow(follow):
+    """Добавляет в ленту подписчика последние посты нового автора."""
+    if follow.author_id in fan_in_authors():
+        return
+    posts = Post.objects.filter(author_id=follow.author_id).order_by(
+        '-pub_date', '-pk').values_list('pk', 'pub_date')
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=follow.user_id, post_id=pk,
+                   author_id=follow.author_id, pub_date=pub_date)
+         for pk, pub_date in posts[:settings.FEED_BACKFILL_LIMIT]),
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out_posts(post_ids):
+    """fan_out_post для пачки постов: INSERT ... SELECT (импорт).
+
+    Авторов в fan-in отсекает флаг UserStats.fan_in, а не список id в
+    запросе: список может быть длиннее предела параметров SQLite.
+    """
+    entries, posts, follows, stats = (
+        model._meta.db_table
+        for model in (FeedEntry, Post, Follow, UserStats))
+    with connection.cursor() as cursor:
+        for chunk in chunks(post_ids):
+            cursor.execute(
+                f'INSERT OR IGNORE INTO {entries} '
+                f'(user_id, post_id, author_id, pub_date) '
+                f'SELECT f.user_id, p.id, p.author_id, p.pub_date '
+                f'FROM {posts} p '
+                f'JOIN {follows} f ON f.author_id = p.author_id '
+                f'WHERE p.id IN ({", ".join(["%s"] * len(chunk))}) '
+                f'AND NOT EXISTS (SELECT 1 FROM {stats} s '
+                f'WHERE s.user_id = p.author_id AND s.fan_in)', chunk)
+
+
+def backfill_follows(follows):
+    """backfill_follow для пачки подписок (импорт, наполнение базы).
+
+    Последние FEED_BACKFILL_LIMIT постов каждого автора выбирает оконная
+    функция, вставка - один INSERT ... SELECT на кусок подписок: по два
+    параметра на подписку и еще один на предел, всего не больше
+    MAX_VARIABLES.
+    """
+    fan_in = fan_in_authors()
+    pairs = [(follow.user_id, follow.author_id) for follow in follows
+             if follow.author_id not in fan_in]
+    entries, posts = FeedEntry._meta.db_table, Post._meta.db_table
+    with connection.cursor() as cursor:
+        for chunk in chunks(pairs, (MAX_VARIABLES - 1) // 2):
+            values = ', '.join(['(%s, %s)'] * len(chunk))
+            cursor.execute(
+                f'WITH new (user_id, author_id) AS (VALUES {values}) '
+                f'INSERT OR IGNORE INTO {entries} '
+                f'(user_id, post_id, author_id, pub_date) '
+                f'SELECT new.user_id, p.id, p.author_id, p.pub_date '
+                f'FROM new JOIN ('
+                f'SELECT id, author_id, pub_date, row_number() OVER ('
+                f'PARTITION BY author_id ORDER BY pub_date DESC, id DESC'
+                f') AS number FROM {posts} '
+                f'WHERE author_id IN (SELECT author_id FROM new)'
+                f') p ON p.author_id = new.author_id AND p.number <= %s',
+                [value for pair in chunk for value in pair]
+                + [settings.FEED_BACKFILL_LIMIT])
+
+
+def trim_follow(follow):
+    """Убирает из ленты подписчика посты автора, от которого он отписался."""
+    FeedEntry.objects.filter(
+        user_id=follow.user_id, author_id=follow.author_id).delete()
+
+
+def follow_feed(user):
+    """Посты авторов, на которых подписан user, от новых к старым."""
+    fan_in = fan_in_authors()
+    celebrities = list(
+        Follow.objects.filter(user=user, author_id__in=fan_in)
+        .values_list('author_id', flat=True)
+    ) if fan_in else []
+    if not celebrities:
+        return Post.objects.filter(feed_entries__user=user).order_by(
+            '-feed_entries__pub_date', '-feed_entries__post')
+    entries = FeedEntry.objects.filter(user=user).values('post')
+    return Post.objects.filter(
+        Q(pk__in=entries) | Q(author_id__in=celebrities)
+    ).order_by('-pub_date', '-pk')
@@ -0,0 +1,126 @@
+"""Хранилище ключей sorl-thumbnail с пакетным чтением.
+
+Стандартный cached_db делает по одному обращению к кэшу (а при промахе
+еще и к БД) на каждую картинку страницы. Здесь перед ним стоит небольшой
+LRU в памяти процесса, а prefetch() загружает ключи всех картинок
+страницы одним get_many и, для промахов, одним SELECT ... IN.
+
+    THUMBNAIL_KVSTORE = 'posts.kvstore.KVStore'
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+
+class LRUCache:
+    """Ограниченный по размеру и времени жизни словарь, общий для потоков.
+
+    Время жизни нужно потому, что другие процессы могут удалить или
+    пересоздать миниатюру, а сбросить чужой LRU они не могут.
+    """
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if not self.size:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.timeout)
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def _is_image_key(key):
+    # Списки миниатюр источника (identity='thumbnails') дописывают разные
+    # процессы, копия в памяти легко устареет; их в LRU не держим.
+    return key.startswith(add_prefix(''))
+
+
+class KVStore(cached_db_kvstore.KVStore):
+    def __init__(self):
+        super().__init__()
+        self.lru = LRUCache(settings.THUMBNAIL_LRU_SIZE,
+                            settings.THUMBNAIL_LRU_TIMEOUT)
+
+    def clear(self, delete_thumbnails=False):
+        super().clear(delete_thumbnails)
+        self.lru.clear()
+
+    def prefetch(self, keys):
+        """Загружает значения ключей (без префикса sorl) в LRU.
+
+        Не больше одного обращения к кэшу и одного запроса к БД на вызов.
+        Отсутствующие ключи, как и в cached_db, запоминаются в кэше
+        пустым значением, чтобы не искать их в БД повторно.
+        """
+        keys = [
+            key for key in dict.fromkeys(add_prefix(key) for key in keys)
+            if self.lru.get(key) is None
+        ]
+        if not keys:
+            return
+        found = self.cache.get_many(keys)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            rows = dict(KVStoreModel.objects.filter(
+                key__in=missing).values_list('key', 'value'))
+            self.cache.set_many(
+                {key: rows.get(key, EMPTY_VALUE) for key in missing},
+                sorl_settings.THUMBNAIL_CACHE_TIMEOUT,
+            )
+            found.update(rows)
+        for key, value in found.items():
+            if value != EMPTY_VALUE:
+                self.lru.set(key, value)
+
+    def _get_raw(self, key):
+        if not _is_image_key(key):
+            return super()._get_raw(key)
+        value = self.lru.get(key)
+        if value is None:
+            value = super()._get_raw(key)
+            if value is not None:
+                self.lru.set(key, value)
+        return value
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        if _is_image_key(key):
+            self.lru.set(key, value)
+
+    def _delete_raw(self, *keys):
+        super()._delete_raw(*keys)
+        for key in keys:
+            self.lru.delete(key)
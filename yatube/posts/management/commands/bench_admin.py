@@ -0,0 +1,122 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from posts.models import Group, Post
+from posts.search import rebuild_index
+
+User = get_user_model()
+
+WORDS = ('кот собака прогулка утро вечер город море лес дорога книга '
+         'работа музыка погода друг дом поезд река гора снег солнце '
+         'дождь кофе чай фильм игра проект код пост фото праздник').split()
+BATCH_SIZE = 10000
+
+
+class LegacyPostAdmin(admin.ModelAdmin):
+    """PostAdmin в том виде, в каком он был до оптимизации."""
+    list_display = ('pk', 'text', 'pub_date', 'author', 'group')
+    list_editable = ('group',)
+    search_fields = ('text',)
+    list_filter = ('pub_date',)
+    empty_value_display = '-пусто-'
+
+
+class Command(BaseCommand):
+    help = ('Замеряет список постов в админке до и после оптимизации на '
+            'таблице из --posts постов. Данные создаются в отдельной '
+            'тестовой БД, рабочая база и кэш не затрагиваются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Сколько раз открывать каждую страницу.')
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(CACHES={'default': {
+                    'BACKEND': 'django.core.cache.backends.locmem.'
+                               'LocMemCache'}}):
+                self.seed(options)
+                self.measure(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, options):
+        started = time.perf_counter()
+        rng = random.Random(0)
+        users = User.objects.bulk_create(
+            User(username=f'user{i}') for i in range(options['users']))
+        groups = Group.objects.bulk_create(
+            Group(title=f'Группа {i}', slug=f'group-{i}', description='')
+            for i in range(options['groups']))
+        user_ids = [user.pk for user in User.objects.all()]
+        group_ids = [group.pk for group in Group.objects.all()]
+        now = timezone.now()
+        created = 0
+        while created < options['posts']:
+            size = min(BATCH_SIZE, options['posts'] - created)
+            Post.objects.bulk_create(
+                Post(
+                    author_id=rng.choice(user_ids),
+                    group_id=rng.choice(group_ids) if rng.random() < .7
+                    else None,
+                    text=' '.join(rng.choices(WORDS, k=rng.randint(20, 80))),
+                    pub_date=now - timedelta(minutes=created + i),
+                )
+                for i in range(size))
+            created += size
+        for _ in rebuild_index():
+            pass
+        self.stdout.write(
+            f'Постов: {created}, пользователей: {len(users)}, групп: '
+            f'{len(groups)}; данные созданы за '
+            f'{time.perf_counter() - started:.0f} с')
+
+    def measure(self, options):
+        request_user = User.objects.create_superuser(
+            'bench', 'bench@example.com', 'bench')
+        week_ago = (timezone.now() - timedelta(days=7)).date()
+        tomorrow = (timezone.now() + timedelta(days=1)).date()
+        last_page = (options['posts'] - 1) // admin.site._registry[
+            Post].list_per_page
+        pages = {
+            'первая страница': {},
+            'последняя страница': {'p': last_page},
+            'фильтр за 7 дней': {'pub_date__gte': str(week_ago),
+                                 'pub_date__lt': str(tomorrow)},
+            'поиск': {'q': 'прогулка'},
+        }
+        model_admins = {
+            'было': LegacyPostAdmin(Post, admin.site),
+            'стало': admin.site._registry[Post],
+        }
+        factory = RequestFactory()
+        for page, params in pages.items():
+            for label, model_admin in model_admins.items():
+                timings = []
+                for _ in range(options['repeat']):
+                    request = factory.get('/admin/posts/post/', params)
+                    request.user = request_user
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        model_admin.changelist_view(request).render()
+                        timings.append(time.perf_counter() - started)
+                self.stdout.write(
+                    f'{page:>18} | {label:>5}: первый '
+                    f'{timings[0] * 1000:8.1f} мс, медиана '
+                    f'{statistics.median(timings) * 1000:8.1f} мс, '
+                    f'запросов {len(queries)}')
@@ -0,0 +1,112 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+
+from posts.encoding import encode_variants, setup_process
+from posts.thumbnails import thumbnail_variants
+from posts.views import NUMBER_OF_POSTS
+
+# Так картинки постов показывались до появления вариантов.
+BASELINE = ('960x339', 'JPEG')
+
+
+def synthetic_image(size, seed):
+    """JPEG, который сжимается примерно как фотография, а не как заливка."""
+    channels = [
+        Image.radial_gradient('L').resize(size),
+        Image.linear_gradient('L').rotate(seed * 37).resize(size),
+        Image.effect_noise(size, 24 + seed % 8),
+    ]
+    buffer = BytesIO()
+    Image.merge('RGB', channels).save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = ('Измеряет скорость сжатия картинок постов во все варианты '
+            'в одном процессе и в пуле процессов, а также сколько байт '
+            'весит страница ленты в каждом варианте.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*',
+                            help='Картинки для замера; по умолчанию '
+                                 'создаются синтетические.')
+        parser.add_argument('--images', type=int, default=12,
+                            help='Сколько синтетических картинок создать.')
+        parser.add_argument('--size', default='2400x1600',
+                            help='Размер синтетических картинок.')
+        parser.add_argument('--processes', type=int,
+                            default=os.cpu_count(),
+                            help='Сколько процессов в пуле.')
+
+    def handle(self, *args, **options):
+        sources = self.load_sources(options)
+        variants = thumbnail_variants()
+        self.stdout.write(
+            f'Картинок: {len(sources)}, вариантов на картинку: '
+            f'{len(variants)}, процессов: {options["processes"]}')
+
+        start = time.perf_counter()
+        results = [encode_variants(data, variants) for data in sources]
+        serial = len(sources) / (time.perf_counter() - start)
+
+        with ProcessPoolExecutor(
+                max_workers=options['processes'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=setup_process) as pool:
+            # Запуск процессов и django.setup() в замер не входят.
+            list(pool.map(encode_variants, sources[:options['processes']],
+                          [variants] * options['processes']))
+            start = time.perf_counter()
+            list(pool.map(encode_variants, sources,
+                          [variants] * len(sources)))
+            parallel = len(sources) / (time.perf_counter() - start)
+
+        self.stdout.write(f'{"режим":<16}{"картинок/с":>12}{"ускорение":>12}')
+        self.stdout.write(f'{"один процесс":<16}{serial:>12.2f}{1:>12.2f}')
+        self.stdout.write(
+            f'{"пул процессов":<16}{parallel:>12.2f}'
+            f'{parallel / serial:>12.2f}')
+        self.report_bytes(variants, results)
+
+    def load_sources(self, options):
+        if options['paths']:
+            sources = []
+            for path in options['paths']:
+                try:
+                    with open(path, 'rb') as file:
+                        sources.append(file.read())
+                except OSError as error:
+                    raise CommandError(error)
+            return sources
+        try:
+            size = tuple(int(side) for side in options['size'].split('x'))
+        except ValueError:
+            raise CommandError('Размер задается как ШИРИНАxВЫСОТА')
+        return [synthetic_image(size, seed)
+                for seed in range(options['images'])]
+
+    def report_bytes(self, variants, results):
+        totals = [0] * len(variants)
+        for _, encoded in results:
+            for index, (raw, _) in enumerate(encoded):
+                totals[index] += len(raw)
+        per_page = {
+            (geometry, options['format']):
+                total / len(results) * NUMBER_OF_POSTS
+            for (geometry, options), total in zip(variants, totals)
+        }
+        baseline = per_page.get(BASELINE)
+        self.stdout.write(
+            f'\nБайт на страницу из {NUMBER_OF_POSTS} постов с картинками:')
+        self.stdout.write(f'{"вариант":<16}{"КБ":>10}{"от 960 JPEG":>14}')
+        for (geometry, format_), size in per_page.items():
+            share = f'{size / baseline:.0%}' if baseline else '-'
+            self.stdout.write(
+                f'{geometry + " " + format_:<16}{size / 1024:>10.1f}'
+                f'{share:>14}')
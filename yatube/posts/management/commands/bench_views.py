@@ -0,0 +1,305 @@
+import json
+import platform
+import random
+import resource
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+from urllib.parse import urlencode
+from wsgiref.util import setup_testing_defaults
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.http import HttpRequest
+from django.middleware.csrf import get_token
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core.bench import percentiles
+from posts.models import Follow, Group, Post
+from posts.seed import Seeder
+from yatube.wsgi import application
+
+User = get_user_model()
+
+# Отклонение p95 от эталона, которое еще не считается регрессией.
+TOLERANCE = .2
+MEMORY_SAMPLES = 10
+
+
+class WSGIDriver:
+    """Вызывает WSGI-приложение в том же процессе, без сети."""
+
+    def __init__(self, cookies=''):
+        self.cookies = cookies
+
+    def __call__(self, method, path, data=None):
+        path, _, query = path.partition('?')
+        body = urlencode(data or {}).encode()
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+            'CONTENT_LENGTH': str(len(body)),
+            'HTTP_COOKIE': self.cookies,
+            'wsgi.input': BytesIO(body),
+        }
+        setup_testing_defaults(environ)
+        if method == 'POST':
+            environ['HTTP_X_CSRFTOKEN'] = self.csrf_token
+        result = {}
+
+        def start_response(status, headers, exc_info=None):
+            result['status'] = int(status.split()[0])
+            result['headers'] = dict(headers)
+
+        response = application(environ, start_response)
+        try:
+            for _ in response:
+                pass
+        finally:
+            response.close()
+        return result['status'], result['headers']
+
+    def login(self, user):
+        """Сессия user и CSRF-токен для POST-запросов."""
+        client = Client()
+        client.force_login(user)
+        session = client.cookies[settings.SESSION_COOKIE_NAME].value
+        request = HttpRequest()
+        self.csrf_token = get_token(request)
+        self.cookies = (f'{settings.SESSION_COOKIE_NAME}={session}; '
+                        f'{settings.CSRF_COOKIE_NAME}='
+                        f'{request.META["CSRF_COOKIE"]}')
+
+
+class Command(BaseCommand):
+    help = ('Замеряет представления постов через WSGI-приложение '
+            'yatube/wsgi.py: задержки p50/p95/p99, запросы в секунду, '
+            'запросы к БД и пиковую память на запрос. Результат - JSON; '
+            'с --baseline сравнивает с сохраненным результатом и '
+            'завершается ошибкой при регрессии. По умолчанию данные '
+            'создаются в отдельной тестовой БД (seed_data).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Сколько замеряемых запросов на адрес.')
+        parser.add_argument('--warmup', type=int, default=20,
+                            help='Сколько запросов сделать до замера.')
+        parser.add_argument('--views', nargs='+',
+                            help='Какие адреса замерять (по умолчанию все).')
+        parser.add_argument('--output', '-o',
+                            help='Куда записать JSON, по умолчанию stdout.')
+        parser.add_argument('--baseline',
+                            help='JSON прошлого запуска для сравнения.')
+        parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                            help='Допустимый рост p95, доля.')
+        parser.add_argument('--existing', action='store_true',
+                            help='Замерять на настроенной БД (уже '
+                                 'наполненной seed_data). Пишущие адреса '
+                                 'создают в ней посты и комментарии.')
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--posts', type=int, default=100_000)
+        parser.add_argument('--comments', type=int, default=200_000)
+        parser.add_argument('--follows', type=float, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        unknown = set(options['views'] or ()) - set(self.scenarios())
+        if unknown:
+            raise CommandError(f'Нет адресов: {", ".join(sorted(unknown))}')
+        # Данные идут в stdout, если не указан --output.
+        self.log = self.stderr if not options['output'] else self.stdout
+        cache_dir = tempfile.mkdtemp()
+        old_name = connection.settings_dict['NAME']
+        if not options['existing']:
+            connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(
+                    DEBUG=False, QUERY_COUNT_HEADERS=True,
+                    CACHES={'default': {
+                        'BACKEND': 'core.cache.SQLiteCache',
+                        'LOCATION': f'{cache_dir}/cache.sqlite3'}}):
+                if not options['existing']:
+                    self.seed(options)
+                report = self.measure(options)
+        finally:
+            if not options['existing']:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+        data = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(data + '\n')
+        else:
+            self.stdout.write(data)
+        if options['baseline']:
+            self.compare(report, options['baseline'], options['tolerance'])
+
+    def seed(self, options):
+        self.log.write('Наполнение тестовой БД...')
+        Seeder(options['seed']).run(
+            users=options['users'], groups=max(options['users'] // 100, 1),
+            posts=options['posts'], comments=options['comments'],
+            follows=options['follows'], days=365)
+
+    @staticmethod
+    def scenarios():
+        """Адрес: (метод, нужен ли вход, функция (цели, rng) -> запрос)."""
+        def page(rng):
+            return f'?page={rng.randint(1, 5)}'
+
+        return {
+            'index': ('GET', False, lambda t, rng: (
+                reverse('posts:index') + page(rng), None)),
+            'group_posts': ('GET', False, lambda t, rng: (
+                reverse('posts:group_list', args=[rng.choice(t['groups'])])
+                + page(rng), None)),
+            'profile': ('GET', False, lambda t, rng: (
+                reverse('posts:profile', args=[rng.choice(t['authors'])])
+                + page(rng), None)),
+            'post_detail': ('GET', False, lambda t, rng: (
+                reverse('posts:post_detail', args=[rng.choice(t['posts'])]),
+                None)),
+            'follow_index': ('GET', True, lambda t, rng: (
+                reverse('posts:follow_index') + page(rng), None)),
+            'post_create': ('POST', True, lambda t, rng: (
+                reverse('posts:post_create'),
+                {'text': f'Пост бенчмарка {rng.random()}'})),
+            'post_edit': ('POST', True, lambda t, rng: (
+                reverse('posts:post_edit', args=[t['own_post']]),
+                {'text': f'Правка бенчмарка {rng.random()}'})),
+            'add_comment': ('POST', True, lambda t, rng: (
+                reverse('posts:add_comment', args=[rng.choice(t['posts'])]),
+                {'text': f'Комментарий бенчмарка {rng.random()}'})),
+            'profile_follow': ('GET', True, lambda t, rng: (
+                reverse('posts:profile_follow',
+                        args=[rng.choice(t['authors'])]), None)),
+            'profile_unfollow': ('GET', True, lambda t, rng: (
+                reverse('posts:profile_unfollow',
+                        args=[rng.choice(t['authors'])]), None)),
+        }
+
+    def targets(self, rng):
+        """Случайные, но одинаковые при одном seed цели запросов."""
+        # Читатель с самой большой лентой подписок.
+        reader = User.objects.annotate(
+            follows=Count('follower')).order_by('-follows', 'pk').first()
+        if reader is None:
+            raise CommandError('В БД нет пользователей: нужен seed_data')
+        own_post = Post.objects.filter(author=reader).values_list(
+            'pk', flat=True).first()
+        if own_post is None:
+            own_post = Post.objects.create(author=reader, text='Пост').pk
+        last = Post.objects.order_by('-pk').values_list('pk', flat=True)[0]
+        authors = list(Follow.objects.values('author__username').annotate(
+            followers=Count('pk')).order_by('-followers').values_list(
+            'author__username', flat=True)[:100])
+        return reader, {
+            'groups': list(Group.objects.values_list('slug', flat=True)[:100]),
+            'authors': authors or [reader.username],
+            'posts': [
+                Post.objects.filter(pk__gte=rng.randint(1, last)).order_by(
+                    'pk').values_list('pk', flat=True)[0]
+                for _ in range(500)],
+            'own_post': own_post,
+        }
+
+    def measure(self, options):
+        rng = random.Random(options['seed'])
+        reader, targets = self.targets(rng)
+        anonymous, authorized = WSGIDriver(), WSGIDriver()
+        authorized.login(reader)
+        views = {}
+        for name, (method, login, make) in self.scenarios().items():
+            if options['views'] and name not in options['views']:
+                continue
+            driver = authorized if login else anonymous
+            requests = [make(targets, rng) for _ in range(
+                options['warmup'] + options['requests'] + MEMORY_SAMPLES)]
+            views[name] = self.run(driver, method, requests, options)
+            self.log.write(
+                f'{name:>16}: p50 {views[name]["p50_ms"]:7.1f} мс, '
+                f'p95 {views[name]["p95_ms"]:7.1f} мс, '
+                f'{views[name]["rps"]:6.0f} rps, '
+                f'запросов к БД {views[name]["queries"]}')
+        return {
+            'meta': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'sqlite': connection.Database.sqlite_version,
+                'posts': Post.objects.count(),
+                'users': User.objects.count(),
+                'requests': options['requests'],
+                'max_rss_kb': resource.getrusage(
+                    resource.RUSAGE_SELF).ru_maxrss,
+            },
+            'views': views,
+        }
+
+    def run(self, driver, method, requests, options):
+        warmup, count = options['warmup'], options['requests']
+        for path, data in requests[:warmup]:
+            driver(method, path, data)
+        latencies, queries = [], []
+        for path, data in requests[warmup:warmup + count]:
+            started = time.perf_counter()
+            status, headers = driver(method, path, data)
+            latencies.append(time.perf_counter() - started)
+            if status >= 400:
+                raise CommandError(f'{method} {path}: ответ {status}')
+            queries.append(int(headers.get('X-Query-Count', 0)))
+        # Память отдельным проходом: tracemalloc замедляет запросы.
+        # Перезапуск tracemalloc обнуляет пик: reset_peak() есть только с
+        # Python 3.9.
+        peaks = []
+        for path, data in requests[warmup + count:]:
+            tracemalloc.start()
+            try:
+                driver(method, path, data)
+                peaks.append(tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+        p50, p95, p99 = percentiles(latencies, 50, 95, 99)
+        return {
+            'requests': count,
+            'rps': round(count / sum(latencies), 1),
+            'p50_ms': round(p50 * 1000, 2),
+            'p95_ms': round(p95 * 1000, 2),
+            'p99_ms': round(p99 * 1000, 2),
+            'queries': statistics.median_high(queries),
+            'max_queries': max(queries),
+            'peak_memory_kb': round(max(peaks, default=0) / 1024),
+        }
+
+    def compare(self, report, path, tolerance):
+        with open(path, encoding='utf-8') as file:
+            baseline = json.load(file)['views']
+        regressions = []
+        for name, current in report['views'].items():
+            old = baseline.get(name)
+            if old is None:
+                continue
+            ratio = current['p95_ms'] / old['p95_ms'] if old['p95_ms'] else 1
+            self.log.write(
+                f'{name:>16}: p95 {old["p95_ms"]:.1f} -> '
+                f'{current["p95_ms"]:.1f} мс ({ratio - 1:+.0%}), запросов '
+                f'{old["queries"]} -> {current["queries"]}')
+            if ratio > 1 + tolerance:
+                regressions.append(f'{name}: p95 вырос на {ratio - 1:.0%}')
+            if current['queries'] > old['queries']:
+                regressions.append(
+                    f'{name}: запросов {old["queries"]} -> '
+                    f'{current["queries"]}')
+        if regressions:
+            raise CommandError('Регрессии: ' + '; '.join(regressions))
+        self.log.write(self.style.SUCCESS('Регрессий нет'))
@@ -0,0 +1,113 @@
+import os
+import shutil
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+from sorl.thumbnail.conf import settings as sorl_settings
+
+from posts.media import (forget_image, orphaned_images, orphaned_thumbnails,
+                         walk_media)
+
+
+class Throttle:
+    """Не дает команде обрабатывать больше rate файлов в секунду."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.started = time.monotonic()
+        self.count = 0
+
+    def __call__(self):
+        if not self.rate:
+            return
+        self.count += 1
+        delay = self.started + self.count / self.rate - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class Command(BaseCommand):
+    help = ('Удаляет картинки постов, на которые не ссылается ни один пост, '
+            'и миниатюры, о которых не знает sorl-thumbnail. Файлы моложе '
+            'MEDIA_RELEASE_GRACE не трогает.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет удалено.')
+        parser.add_argument(
+            '--quarantine', nargs='?', const=settings.MEDIA_QUARANTINE_ROOT,
+            help='Переносить файлы в каталог (по умолчанию '
+                 'MEDIA_QUARANTINE_ROOT), а не удалять.')
+        parser.add_argument(
+            '--rate', type=float, default=200,
+            help='Сколько файлов в секунду проверять, 0 - без ограничения.')
+        parser.add_argument(
+            '--grace', type=int, default=settings.MEDIA_RELEASE_GRACE,
+            help='Не трогать файлы, измененные меньше стольких секунд назад.')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.throttle = Throttle(options['rate'])
+        self.newer_than = time.time() - options['grace']
+        forgotten = set()
+
+        def forget(name):
+            keys = forget_image(name, dry_run=options['dry_run'])
+            if options['dry_run']:
+                forgotten.update(keys)
+
+        images = self.collect(orphaned_images(self.walk('posts')), forget)
+        thumbnails = self.collect(orphaned_thumbnails(
+            self.walk(sorl_settings.THUMBNAIL_PREFIX.rstrip('/')), forgotten))
+
+        verb = 'Можно освободить' if options['dry_run'] else 'Освобождено'
+        freed = images[1] + thumbnails[1]
+        self.stdout.write(self.style.SUCCESS(
+            f'Картинок: {images[0]}, миниатюр: {thumbnails[0]}. '
+            f'{verb}: {freed} байт ({filesizeformat(freed)})'))
+
+    def walk(self, directory):
+        for file in walk_media(directory):
+            self.throttle()
+            if file[2] < self.newer_than:
+                yield file
+
+    def collect(self, files, before=None):
+        count = freed = 0
+        for name, size, _ in files:
+            if not self.stale(name):
+                continue
+            if before is not None:
+                before(name)
+            if self.options['dry_run']:
+                self.stdout.write(name)
+            elif not self.remove(name):
+                continue
+            count += 1
+            freed += size
+        return count, freed
+
+    def stale(self, name):
+        """Перепроверка перед удалением: файл могли сохранить заново
+        (ContentAddressedStorage обновляет mtime) уже после обхода."""
+        try:
+            path = os.path.join(settings.MEDIA_ROOT, name)
+            return os.path.getmtime(path) < self.newer_than
+        except FileNotFoundError:
+            return False
+
+    def remove(self, name):
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        try:
+            if self.options['quarantine']:
+                target = os.path.join(self.options['quarantine'], name)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.move(path, target)
+            else:
+                os.remove(path)
+        except FileNotFoundError:
+            return False
+        return True
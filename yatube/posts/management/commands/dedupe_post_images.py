@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+
+from core.storage import is_hashed
+from posts.media import relink_image
+from posts.models import Post, post_image_storage
+
+CHUNK_SIZE = 100
+
+
+class Command(BaseCommand):
+    help = ('Переводит картинки постов на имена по содержимому: одинаковые '
+            'файлы остаются в одном экземпляре, копии удаляются. '
+            'Повторный запуск продолжает с необработанных файлов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать копии и освобождаемое место.')
+
+    def handle(self, *args, **options):
+        storage = post_image_storage
+        seen = set()
+        files = missing = freed = 0
+        last = ''
+        while True:
+            chunk = list(
+                Post.objects.filter(image__gt=last).order_by('image')
+                .values_list('image', flat=True).distinct()[:CHUNK_SIZE]
+            )
+            if not chunk:
+                break
+            last = chunk[-1]
+            for name in chunk:
+                if is_hashed(name):
+                    continue
+                if not storage.exists(name):
+                    missing += 1
+                    continue
+                files += 1
+                with storage.open(name) as file:
+                    new_name = storage.hashed_name(name, file)
+                    if new_name in seen or storage.exists(new_name):
+                        freed += storage.size(name)
+                    seen.add(new_name)
+                    if options['dry_run']:
+                        continue
+                    new_name = storage.save(name, file)
+                relink_image(name, new_name)
+        verb = 'Можно освободить' if options['dry_run'] else 'Освобождено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Файлов: {files}, уникальных: {len(seen)}, '
+            f'не найдено: {missing}. {verb}: {freed} байт'))
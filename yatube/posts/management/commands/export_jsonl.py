@@ -0,0 +1,55 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.transfer import CHUNK_SIZE, EXPORT_FIELDS, export_lines
+
+
+class Command(BaseCommand):
+    help = ('Выгружает группы, посты, комментарии и подписки в JSONL, по '
+            'объекту в строке. Файл загружается обратно командой '
+            'import_jsonl.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', '-o',
+            help='Файл для записи, по умолчанию стандартный вывод.')
+        parser.add_argument(
+            '--models', nargs='+', choices=list(EXPORT_FIELDS),
+            default=list(EXPORT_FIELDS), help='Что выгружать.')
+        parser.add_argument(
+            '--offset', type=int, default=0,
+            help='Пропустить столько строк и дописать остальные в --output: '
+                 'продолжение прерванной выгрузки.')
+        parser.add_argument(
+            '--progress', type=int, default=CHUNK_SIZE * 50,
+            help='Сообщать о ходе работы через столько строк.')
+
+    def handle(self, *args, **options):
+        offset = options['offset']
+        if options['output']:
+            output = open(options['output'], 'a' if offset else 'w',
+                          encoding='utf-8')
+        else:
+            output = sys.stdout
+        started = time.perf_counter()
+        written = 0
+        try:
+            for line in export_lines(options['models'], offset):
+                output.write(line + '\n')
+                written += 1
+                if written % options['progress'] == 0:
+                    self.report(offset + written, started, written)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        self.report(offset + written, started, written, done=True)
+
+    def report(self, position, started, written, done=False):
+        # Данные могут идти в stdout, поэтому сообщения - в stderr.
+        elapsed = time.perf_counter() - started
+        message = (f'Строк: {position}, {written / (elapsed or 1):.0f} в '
+                   f'секунду')
+        self.stderr.write(self.style.SUCCESS(f'Готово. {message}')
+                          if done else message)
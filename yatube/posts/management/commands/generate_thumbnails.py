@@ -0,0 +1,41 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate_in_worker
+
+CHUNK_SIZE = 100
+
+
+class Command(BaseCommand):
+    help = ('Создает все варианты миниатюр (THUMBNAIL_GEOMETRIES в форматах '
+            'THUMBNAIL_FORMATS) для уже загруженных картинок постов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.THUMBNAIL_WORKERS or 1,
+            help='Сколько картинок обрабатывать одновременно.')
+
+    def handle(self, *args, **options):
+        done = failed = 0
+        last = ''
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            # Картинки берутся порциями по имени: пул не копит задачи для
+            # всей таблицы, а чтение не держит блокировку SQLite, пока
+            # воркеры пишут в хранилище миниатюр.
+            while True:
+                chunk = list(
+                    Post.objects.filter(image__gt=last).order_by('image')
+                    .values_list('image', flat=True).distinct()[:CHUNK_SIZE]
+                )
+                if not chunk:
+                    break
+                last = chunk[-1]
+                for ready in pool.map(generate_in_worker, chunk):
+                    done += ready
+                    failed += not ready
+                self.stdout.write(f'Обработано картинок: {done + failed}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {done}, с ошибками: {failed}'))
@@ -0,0 +1,60 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts.cache import bump
+from posts.counters import recount
+from posts.transfer import BATCH_SIZE, Importer, TransferError
+
+
+class Command(BaseCommand):
+    help = ('Загружает группы, посты, комментарии и подписки из JSONL '
+            '(формат export_jsonl). Недостающие пользователи создаются без '
+            'пароля. Прерванную загрузку продолжают с --offset, '
+            'напечатанного последним.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', help='Файл JSONL, по умолчанию стандартный '
+                                    'ввод.')
+        parser.add_argument(
+            '--offset', type=int, default=0,
+            help='Пропустить столько строк с начала файла.')
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Сколько строк загружать в одной транзакции.')
+        parser.add_argument(
+            '--no-recount', action='store_true',
+            help='Не пересчитывать счетчики в конце (recount_counters).')
+
+    def handle(self, *args, **options):
+        importer = Importer(options['batch_size'])
+        source = (open(options['path'], encoding='utf-8')
+                  if options['path'] else sys.stdin)
+        started = time.perf_counter()
+        position = options['offset']
+        try:
+            for position in importer.run(source, options['offset']):
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'Загружено строк: {position} (--offset {position}), '
+                    f'{(position - options["offset"]) / elapsed:.0f} '
+                    f'в секунду')
+        except TransferError as error:
+            raise CommandError(
+                f'{error}. Загружено строк: {position}, продолжить можно '
+                f'с --offset {position}')
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            # И после ошибки: уже зафиксированные пачки должны получить
+            # верные счетчики, а страницы с ними - новые поколения.
+            if not options['no_recount']:
+                with transaction.atomic():
+                    recount()
+                bump(*importer.namespaces)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: строк {position}, создано пользователей '
+            f'{importer.created_users}'))
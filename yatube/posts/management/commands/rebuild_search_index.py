@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = ('Заново строит полнотекстовый индекс постов. Нужен после '
+            'массовых правок в обход модели (queryset.update, загрузка '
+            'дампа в SQL). Пока команда работает, поиск находит не все.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='Сколько постов индексировать за запрос.')
+
+    def handle(self, *args, **options):
+        done = 0
+        for done in rebuild_index(options['batch_size']):
+            self.stdout.write(f'Проиндексировано: {done}')
+        self.stdout.write(self.style.SUCCESS(f'Готово: {done} постов'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import recount
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счетчики постов, комментариев и подписок по '
+            'таблицам. Нужен после записей в обход моделей: bulk_create, '
+            'queryset.update, loaddata.')
+
+    def handle(self, *args, **options):
+        # Страницы не увидят счетчики, пересчитанные наполовину.
+        with transaction.atomic():
+            recount()
+        self.stdout.write(self.style.SUCCESS('Счетчики пересчитаны'))
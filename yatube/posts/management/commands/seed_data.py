@@ -0,0 +1,77 @@
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from posts.seed import BATCH_SIZE, EPOCH, PASSWORD, Seeder, SeedError
+
+
+class Command(BaseCommand):
+    help = ('Наполняет базу синтетическими пользователями, группами, '
+            'постами, комментариями, подписками и картинками. Одинаковые '
+            'параметры, --seed и --start на пустой базе дают одинаковые '
+            'данные. Существующие записи не трогает. Пароль '
+            f'пользователей: {PASSWORD}.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--comments', type=int, default=2_000_000)
+        parser.add_argument(
+            '--follows', type=float, default=20,
+            help='Сколько в среднем подписок у пользователя.')
+        parser.add_argument(
+            '--images', type=int, default=20,
+            help='Сколько разных картинок создать.')
+        parser.add_argument(
+            '--image-share', type=float, default=.1,
+            help='Доля постов с картинкой.')
+        parser.add_argument(
+            '--start', type=datetime.fromisoformat,
+            default=EPOCH.date().isoformat(),
+            help='Дата первого поста, YYYY-MM-DD (UTC).')
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='Сколько дней от --start занимают посты.')
+        parser.add_argument(
+            '--zipf', type=float, default=1.1,
+            help='Показатель степени в законе Ципфа для популярности '
+                 'авторов.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--no-feed', action='store_true',
+            help='Не строить ленты подписок: на больших графах это самая '
+                 'долгая часть.')
+
+    def handle(self, *args, **options):
+        if options['posts'] and not options['users']:
+            raise CommandError('Для постов нужен хотя бы один пользователь')
+        started = time.perf_counter()
+        self.reported = started
+
+        def report(label, done, total):
+            now = time.perf_counter()
+            if done < total and now - self.reported < 5:
+                return
+            self.reported = now
+            self.stdout.write(
+                f'{label}: {done}/{total}, {now - started:.0f} с')
+
+        start = options['start']
+        if timezone.is_naive(start):
+            start = timezone.make_aware(start, timezone.utc)
+        try:
+            Seeder(options['seed'], options['batch_size'], options['zipf'],
+                   report, start).run(
+                users=options['users'], groups=options['groups'],
+                posts=options['posts'], comments=options['comments'],
+                follows=options['follows'], images=options['images'],
+                image_share=options['image_share'], days=options['days'],
+                feed=not options['no_feed'])
+        except SeedError as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.perf_counter() - started:.0f} с'))
@@ -0,0 +1,69 @@
+import os
+import shutil
+
+from django.core.management.base import BaseCommand
+
+from core.storage import is_hashed, is_sharded, shard
+from posts.media import relink_image
+from posts.models import Post, post_image_storage
+
+
+class Command(BaseCommand):
+    help = ('Раскладывает картинки постов из плоского каталога posts/ по '
+            'подкаталогам posts/ab/cd/ и обновляет ссылки в постах. '
+            'Прерванный запуск можно просто повторить.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Сколько файлов обрабатывать за проход.')
+
+    def handle(self, *args, **options):
+        storage = post_image_storage
+        moved = skipped = missing = 0
+        last = ''
+        while True:
+            batch = list(
+                Post.objects.filter(image__gt=last).order_by('image')
+                .values_list('image', flat=True)
+                .distinct()[:options['batch_size']]
+            )
+            if not batch:
+                break
+            last = batch[-1]
+            for name in batch:
+                if is_sharded(name):
+                    continue
+                if not is_hashed(name):
+                    # Сначала имя по содержимому: dedupe_post_images.
+                    skipped += 1
+                    continue
+                new_name = shard(name)
+                if not self.place(storage, name, new_name):
+                    missing += 1
+                    continue
+                relink_image(name, new_name)
+                moved += 1
+            self.stdout.write(f'Перенесено: {moved}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: перенесено {moved}, без имени по содержимому '
+            f'{skipped}, не найдено {missing}'))
+
+    @staticmethod
+    def place(storage, name, new_name):
+        """Кладет файл по новому адресу, не убирая старый.
+
+        Старый файл удаляет relink_image уже после обновления постов, так
+        что при обрыве на любом шаге картинка остается доступной, а
+        повторный запуск продолжит с того же места.
+        """
+        if storage.exists(new_name):
+            return True
+        if not storage.exists(name):
+            return False
+        target = storage.path(new_name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            os.link(storage.path(name), target)
+        except OSError:
+            shutil.copy2(storage.path(name), target)
+        return True
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts.feed import sync_fan_in
+from posts.models import UserStats
+
+
+class Command(BaseCommand):
+    help = ('Сверяет флаги fan-in авторов (UserStats.fan_in) с числом их '
+            'подписчиков и дозаполняет ленты авторов, вышедших из fan-in. '
+            'Нужен после смены FEED_FANOUT_THRESHOLD и записей подписок в '
+            'обход моделей.')
+
+    def handle(self, *args, **options):
+        sync_fan_in()
+        self.stdout.write(self.style.SUCCESS(
+            'Авторов в fan-in: '
+            f'{UserStats.objects.filter(fan_in=True).count()}'))
@@ -0,0 +1,163 @@
+"""Освобождение картинок постов, общих для нескольких постов.
+
+Post.image хранится по имени содержимого (core/storage.py), поэтому один
+файл может принадлежать нескольким постам. Счетчик ссылок - сама таблица
+постов: файл удаляется, только когда на него не ссылается ни один пост.
+
+Файлы, которые остались без ссылок в обход этого (сбой между коммитом и
+удалением, недавно сохраненные файлы, миниатюры старых настроек), находит
+сборщик: orphaned_images() и orphaned_thumbnails(), команда collect_media.
+"""
+import logging
+import os
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from .cache import bump
+from .models import Post, post_image_storage
+from .thumbnails import generate_thumbnails
+
+logger = logging.getLogger(__name__)
+
+# Сколько файлов сборщик проверяет по БД одним запросом.
+CHUNK_SIZE = 500
+
+
+def reference_count(name):
+    return Post.objects.filter(image=name).count()
+
+
+def release_image(name, grace=None):
+    """Удаляет файл name и его миниатюры, если он больше не нужен.
+
+    Файл, который сохраняли или загружали повторно меньше grace
+    (по умолчанию MEDIA_RELEASE_GRACE) секунд назад, не трогаем: его может
+    прямо сейчас сохранять пост, еще не попавший в БД. Такие файлы потом
+    подберет сборщик осиротевших файлов. Возвращает True, если файл удален.
+    """
+    storage = post_image_storage
+    if grace is None:
+        grace = settings.MEDIA_RELEASE_GRACE
+    try:
+        if not name or reference_count(name) or not storage.exists(name):
+            return False
+        if storage.modified_ago(name) < grace:
+            logger.debug('Картинка %s использовалась недавно', name)
+            return False
+        default.kvstore.delete(ImageFile(name, storage))
+        storage.delete(name)
+    except (OSError, SuspiciousFileOperation):
+        # Вызывается после коммита: ошибка не должна ломать удаление поста.
+        logger.warning('Не удалось удалить картинку %s', name, exc_info=True)
+        return False
+    return True
+
+
+def schedule_release(name):
+    """release_image после фиксации транзакции, удалившей ссылку."""
+    if name:
+        transaction.on_commit(lambda: release_image(name))
+
+
+def relink_image(name, new_name):
+    """Переводит все посты с картинки name на new_name и удаляет name.
+
+    Для команд, которые переименовывают уже сохраненные файлы. Посты
+    обновляются одним UPDATE, поэтому страницы в кэше сбрасываются здесь,
+    а не сигналами.
+    """
+    posts = Post.objects.filter(image=name)
+    changed = list(posts.values_list('pk', 'author_id', 'group_id'))
+    posts.update(image=new_name)
+    namespaces = {'index'}
+    for pk, author_id, group_id in changed:
+        namespaces |= {f'post:{pk}', f'author:{author_id}'}
+        if group_id:
+            namespaces.add(f'group:{group_id}')
+    bump(*namespaces)
+    generate_thumbnails(new_name)
+    # Под старым именем файл больше никто не сохранит, ждать не нужно.
+    release_image(name, grace=0)
+
+
+def walk_media(directory):
+    """Файлы каталога directory в MEDIA_ROOT: (имя, размер, mtime).
+
+    Дерево обходится по одному каталогу, в памяти только очередь
+    непройденных каталогов, а не список файлов.
+    """
+    root = settings.MEDIA_ROOT
+    pending = [directory]
+    while pending:
+        current = pending.pop()
+        try:
+            entries = os.scandir(os.path.join(root, current))
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                name = f'{current}/{entry.name}'
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(name)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    yield name, stat.st_size, stat.st_mtime
+
+
+def _chunks(files):
+    chunk = []
+    for file in files:
+        chunk.append(file)
+        if len(chunk) == CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def orphaned_images(files):
+    """Оставляет из files картинки, на которые не ссылается ни один пост."""
+    for chunk in _chunks(files):
+        used = set(Post.objects.filter(image__in=[name for name, *_ in chunk])
+                   .values_list('image', flat=True))
+        yield from (file for file in chunk if file[0] not in used)
+
+
+def orphaned_thumbnails(files, forgotten=()):
+    """Оставляет из files миниатюры, о которых не знает sorl.
+
+    Ключ миниатюры в kvstore вычисляется из имени файла, поэтому проверка -
+    один SELECT ... IN на пачку. forgotten - ключи миниатюр, которые
+    forget_image() вернул для удаляемых картинок.
+    """
+    for chunk in _chunks(files):
+        keys = {add_prefix(ImageFile(file[0], default.storage).key): file
+                for file in chunk}
+        known = set(KVStoreModel.objects.filter(key__in=list(keys))
+                    .values_list('key', flat=True))
+        for key, file in keys.items():
+            if key not in known or key in forgotten:
+                yield file
+
+
+def forget_image(name, dry_run=False):
+    """Убирает из kvstore картинку name и ее миниатюры, не трогая файлы.
+
+    Возвращает ключи миниатюр (с префиксом kvstore): их файлы после этого
+    становятся сиротами и уходят тем же путем, что и остальные.
+    """
+    kvstore = default.kvstore
+    source = ImageFile(name, post_image_storage)
+    thumbnails = kvstore._get(source.key, identity='thumbnails') or []
+    if not dry_run:
+        for key in thumbnails:
+            kvstore._delete(key)
+        kvstore._delete(source.key, identity='thumbnails')
+        kvstore._delete(source.key)
+    return {add_prefix(key) for key in thumbnails}
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Полнотекстовый индекс постов, см. posts/search.py."""
+
+    dependencies = [
+        ('posts', '0015_post_image_content_addressed'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                "CREATE VIRTUAL TABLE posts_post_fts USING fts5("
+                "text, tokenize='unicode61 remove_diacritics 2')",
+                "INSERT INTO posts_post_fts (rowid, text) "
+                "SELECT id, text FROM posts_post",
+            ],
+            reverse_sql=['DROP TABLE posts_post_fts'],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='fan_in',
+            field=models.BooleanField(default=False, verbose_name='Fan-in ленты'),
+        ),
+    ]
@@ -1,12 +1,82 @@
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
 
 from core.models import CreatedModel
+from core.storage import ContentAddressedStorage
 
 User = get_user_model()
 
+# Картинки постов общие для одинаковых загрузок, см. posts/media.py.
+post_image_storage = ContentAddressedStorage()
 
-class Post(CreatedModel):
+
+class PostQuerySet(models.QuerySet):
+    """Выборки постов для лент и страницы поста."""
+
+    def with_relations(self):
+        """Автор и группа приходят тем же запросом, что и посты."""
+        return self.select_related('author', 'group')
+
+    def feed(self):
+        """Посты для ленты: число запросов не зависит от размера страницы."""
+        return self.with_relations()
+
+    def with_counts(self):
+        """Добавляет author_posts_count из счетчиков автора.
+
+        comment_count - столбец поста. Оба счетчика ведет posts/counters.py.
+        """
+        return self.annotate(author_posts_count=Coalesce(
+            'author__stats__posts_count', 0))
+
+    def for_detail(self):
+        """Пост со счетчиками; комментарии выбираются постранично."""
+        return self.with_relations().with_counts()
+
+
+class CommentQuerySet(models.QuerySet):
+
+    def with_author(self):
+        return self.select_related('author')
+
+
+class AtomicSaveMixin:
+    """Сохранение и сигналы post_save в одной транзакции.
+
+    Сигналы меняют счетчики (posts/counters.py): запись и счетчик должны
+    зафиксироваться или откатиться вместе.
+    """
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+
+class CounterFieldsMixin:
+    """Обычное сохранение не пишет столбцы-счетчики counter_fields.
+
+    Счетчики меняет только posts/counters.py через UPDATE ... SET n = n + 1.
+    Значение в загруженном объекте могло устареть: если записать его
+    обратно (форма, admin), пропадут приращения, сделанные с момента
+    загрузки. Новая запись вставляется целиком, со значением по умолчанию.
+    """
+    counter_fields = ()
+
+    def save(self, *args, update_fields=None, **kwargs):
+        if not self._state.adding:
+            if update_fields is None:
+                deferred = self.get_deferred_fields()
+                update_fields = [
+                    field.attname for field in self._meta.concrete_fields
+                    if not field.primary_key
+                    and field.attname not in deferred]
+            update_fields = [name for name in update_fields
+                             if name not in self.counter_fields]
+        super().save(*args, update_fields=update_fields, **kwargs)
+
+
+class Post(AtomicSaveMixin, CounterFieldsMixin, CreatedModel):
     id = models.BigAutoField(primary_key=True)
     text = models.TextField(
         verbose_name='Текст поста',
@@ -31,22 +101,39 @@ class Post(CreatedModel):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
-        blank=True
+        storage=post_image_storage,
+        blank=True,
+        db_index=True,
     )
+    comment_count = models.PositiveIntegerField(
+        'Комментариев', default=0, editable=False)
+
+    counter_fields = ('comment_count',)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
         ordering = ('-pub_date', 'author')
+        indexes = [
+            models.Index(fields=['pub_date', 'id'],
+                         name='post_pub_date_id_idx'),
+            models.Index(fields=['author', 'pub_date', 'id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', 'pub_date', 'id'],
+                         name='post_group_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
 
-class Group(models.Model):
+class Group(CounterFieldsMixin, models.Model):
     id = models.BigAutoField(primary_key=True)
     title = models.CharField(
         max_length=200,
+        db_index=True,
         verbose_name='Название группы',
         help_text='Введите название группы',
     )
@@ -60,6 +147,10 @@ class Group(models.Model):
     description = models.TextField(
         verbose_name='Описание группы',
         help_text='Введите описание группы',)
+    post_count = models.PositiveIntegerField(
+        'Постов', default=0, editable=False)
+
+    counter_fields = ('post_count',)
 
     class Meta:
         verbose_name = 'Группа'
@@ -69,7 +160,7 @@ class Group(models.Model):
         return self.title
 
 
-class Comment(CreatedModel):
+class Comment(AtomicSaveMixin, CreatedModel):
     id = models.BigAutoField(primary_key=True)
     post = models.ForeignKey(
         'Post',
@@ -92,16 +183,22 @@ class Comment(CreatedModel):
         help_text='Введите текст комментария',
     )
 
+    objects = CommentQuerySet.as_manager()
+
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(fields=['post', 'pub_date', 'id'],
+                         name='comment_post_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:25]
 
 
-class Follow(models.Model):
+class Follow(AtomicSaveMixin, models.Model):
     id = models.BigAutoField(primary_key=True)
     user = models.ForeignKey(
         User,
@@ -127,3 +224,74 @@ class Follow(models.Model):
                 name='unique_members'
             )
         ]
+
+
+class UserStats(models.Model):
+    """Счетчики пользователя, которые иначе пришлось бы агрегировать.
+
+    Строка создается при первом изменении счетчика; у пользователя без
+    строки все счетчики нулевые.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+    # Посты автора читаются через fan-in (posts/feed.py). Флаг хранится,
+    # а не вычисляется заново: по нему видно, кто вышел из fan-in и чьи
+    # посты нужно разложить по лентам.
+    fan_in = models.BooleanField('Fan-in ленты', default=False)
+
+    class Meta:
+        verbose_name = 'Счетчики пользователя'
+        verbose_name_plural = 'Счетчики пользователей'
+
+
+class FeedEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя.
+
+    Заполняется при публикации поста (fan-out on write), поэтому лента
+    подписок читается готовым отсортированным срезом по индексу.
+    """
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Подписчик',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пост',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор поста',
+    )
+    pub_date = models.DateTimeField('Дата публикации поста')
+
+    class Meta:
+        ordering = ('-pub_date',)
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи ленты подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['user', 'pub_date', 'post'],
+                         name='feed_user_pub_date_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='feed_user_author_idx'),
+        ]
@@ -0,0 +1,206 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+Индекс - виртуальная таблица posts_post_fts (миграция 0016) с rowid,
+равным id поста. Таблица хранит свою копию текста: тогда snippet()
+работает без обращения к posts_post, а рассинхронизация из-за
+queryset.update() не портит индекс и лечится rebuild_search_index.
+Синхронизацию при сохранении и удалении постов делают сигналы.
+"""
+import base64
+import binascii
+import re
+
+from django.db import connection
+from django.utils.functional import cached_property
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from core.db import chunks
+
+from .models import Post
+from .utils import CursorPage
+
+FTS_TABLE = 'posts_post_fts'
+MAX_TERMS = 8
+# Управляющие символы вместо <mark>: текст экранируется уже после snippet().
+MARK_START, MARK_END = '\x02', '\x03'
+SNIPPET_TOKENS = 16
+
+WORD = re.compile(r'\w+')
+
+
+def match_expression(query):
+    """Переводит ввод пользователя в запрос FTS5 или возвращает ''.
+
+    Каждое слово берется в кавычки, поэтому синтаксис FTS5 (OR, NEAR,
+    столбцы) из ввода не работает и не дает ошибок. Слова ищутся по
+    префиксу: «пост» найдет «посты» и «постами».
+    """
+    terms = WORD.findall(query.lower())[:MAX_TERMS]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def index_post(pk, text):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+            [pk, text])
+
+
+def unindex_post(pk):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [pk])
+
+
+def index_posts(pks):
+    """Индексирует пачку постов по тексту из posts_post (для импорта)."""
+    table = Post._meta.db_table
+    with connection.cursor() as cursor:
+        for chunk in chunks(pks):
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+                chunk)
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text) SELECT id, text '
+                f'FROM {table} WHERE id IN ({placeholders})', chunk)
+
+
+def rebuild_index(batch_size=10000):
+    """Заполняет индекс заново пачками по id и сжимает его.
+
+    Генератор: после каждой пачки отдает число проиндексированных постов.
+    Пачки - INSERT ... SELECT по диапазону первичного ключа, так что
+    запись не держит блокировку SQLite на время всей таблицы.
+    """
+    table = Post._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        last = done = 0
+        while True:
+            cursor.execute(
+                f'SELECT max(id), count(*) FROM (SELECT id FROM {table} '
+                f'WHERE id > %s ORDER BY id LIMIT %s)', [last, batch_size])
+            upper, count = cursor.fetchone()
+            if not count:
+                break
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text) SELECT id, text '
+                f'FROM {table} WHERE id > %s AND id <= %s', [last, upper])
+            last = upper
+            done += count
+            yield done
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+
+
+def filter_matching(queryset, query):
+    """Оставляет в queryset посты, подходящие под query (для админки)."""
+    expression = match_expression(query)
+    if not expression:
+        return queryset.none()
+    # pk__in=RawSQL(...) Django оборачивает во вторые скобки, и SQLite
+    # сравнивает id только с первой строкой подзапроса.
+    table = connection.ops.quote_name(Post._meta.db_table)
+    return queryset.extra(
+        where=[f'{table}.id IN (SELECT rowid FROM {FTS_TABLE} '
+               f'WHERE {FTS_TABLE} MATCH %s)'],
+        params=[expression])
+
+
+def highlight(snippet):
+    """Экранирует фрагмент и размечает найденные слова тегом <mark>."""
+    return mark_safe(escape(snippet).replace(MARK_START, '<mark>')
+                     .replace(MARK_END, '</mark>'))
+
+
+def encode_cursor(rank, pk):
+    raw = f'{rank!r}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        rank, pk = raw.decode().split('|')
+        return float(rank), int(pk)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+class SearchPaginator:
+    """Курсорная пагинация результатов поиска по ключу (bm25, id).
+
+    Токены и шаблоны те же, что у CursorPaginator лент: after/before и
+    CursorPage. Посты страницы с автором и группой приходят одним
+    запросом, у каждого есть search_snippet с подсветкой.
+    """
+
+    def __init__(self, query, per_page):
+        self.expression = match_expression(query)
+        self.per_page = int(per_page)
+
+    @cached_property
+    def count(self):
+        if not self.expression:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s', [self.expression])
+            return cursor.fetchone()[0]
+
+    def get_page(self, after=None, before=None):
+        after = after and decode_cursor(after)
+        before = before and decode_cursor(before)
+        if not self.expression:
+            return CursorPage([], self)
+        if before and not after:
+            rows = self._rows('<', before, 'DESC')
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            return CursorPage(
+                self._posts(rows), self,
+                next_cursor=encode_cursor(*rows[-1][:2]) if rows else None,
+                previous_cursor=(encode_cursor(*rows[0][:2])
+                                 if has_more else None),
+            )
+        rows = self._rows('>', after, 'ASC')
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        return CursorPage(
+            self._posts(rows), self,
+            next_cursor=encode_cursor(*rows[-1][:2]) if has_more else None,
+            previous_cursor=(encode_cursor(*rows[0][:2])
+                             if after and rows else None),
+        )
+
+    def _rows(self, operator, cursor_key, direction):
+        # bm25() меньше у более подходящих документов.
+        params = [MARK_START, MARK_END, '…', SNIPPET_TOKENS,
+                  self.expression]
+        sql = (
+            f'SELECT bm25({FTS_TABLE}) AS score, rowid, '
+            f'snippet({FTS_TABLE}, 0, %s, %s, %s, %s) '
+            f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+        )
+        if cursor_key:
+            sql += f' AND (score, rowid) {operator} (%s, %s)'
+            params += list(cursor_key)
+        sql += f' ORDER BY score {direction}, rowid {direction} LIMIT %s'
+        params.append(self.per_page + 1)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    @staticmethod
+    def _posts(rows):
+        posts = Post.objects.feed().in_bulk([pk for _, pk, _ in rows])
+        page = []
+        for _, pk, snippet in rows:
+            post = posts.get(pk)
+            if post is not None:
+                post.search_snippet = highlight(snippet)
+                page.append(post)
+        return page
@@ -0,0 +1,253 @@
+"""Синтетические данные для проверки на реальных объемах.
+
+Все случайные значения берутся из random.Random(seed), а тексты и имена -
+из пулов, заранее сгенерированных Faker с тем же seed; даты отсчитываются
+от start, а не от текущего времени. Поэтому одинаковые параметры на
+пустой базе дают одинаковые данные. Популярность авторов подчиняется закону
+Ципфа: немногие авторы пишут большую часть постов и собирают большую
+часть подписчиков. Строки пишутся пачками через insert_rows; сигналы при
+этом не срабатывают, поэтому поисковый индекс, ленты подписок и счетчики
+строятся в конце.
+"""
+import io
+import random
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+from PIL import Image, ImageDraw
+
+from .cache import bump
+from .counters import recount
+from .feed import backfill_follows, sync_fan_in
+from .models import Comment, Follow, Group, Post, post_image_storage
+from .search import rebuild_index
+from .transfer import insert_rows
+
+User = get_user_model()
+
+BATCH_SIZE = 10000
+FEED_CHUNK_SIZE = 50000
+# Пароль всех созданных пользователей: под ними входят бенчмарки.
+PASSWORD = 'seed-password'
+POOL_SIZE = 5000
+IMAGE_SIZE = (960, 540)
+# Начало периода постов по умолчанию.
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class SeedError(ValueError):
+    """Данные нельзя создать, не задев существующие записи."""
+
+
+def zipf_weights(count, exponent):
+    """Накопленные веса для random.choices по закону Ципфа."""
+    return list(accumulate(1 / rank ** exponent
+                           for rank in range(1, count + 1)))
+
+
+def _next_id(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+def _date(value):
+    # SQLite хранит время строкой в UTC без пояса.
+    return str(value.replace(tzinfo=None))
+
+
+class Seeder:
+    """Строит набор данных; report(метка, сделано, всего) - ход работы."""
+
+    def __init__(self, seed=0, batch_size=BATCH_SIZE, exponent=1.1,
+                 report=lambda label, done, total: None, start=EPOCH):
+        self.random = random.Random(seed)
+        self.faker = Faker('ru_RU')
+        self.faker.seed_instance(seed)
+        self.batch_size = batch_size
+        self.exponent = exponent
+        self.report = report
+        self.start = start
+
+    def run(self, users, groups, posts, comments, follows, images=0,
+            image_share=.1, days=365, feed=True):
+        """Посты и комментарии занимают days дней от start."""
+        self.sentences = [self.faker.sentence(nb_words=12)
+                          for _ in range(POOL_SIZE)]
+        self.end = self.start + timedelta(days=days)
+        # Группы первыми: конфликт их slug обнаружится до любой записи.
+        self.group_ids = self.create_groups(groups)
+        self.user_ids = self.create_users(users)
+        # Популярные авторы разбросаны по всем id, а не собраны в начале.
+        self.authors = self.user_ids[:]
+        self.random.shuffle(self.authors)
+        self.author_weights = zipf_weights(len(self.authors), self.exponent)
+        self.images = self.create_images(images)
+        self.image_share = image_share if self.images else 0
+        self.first_post = _next_id(Post)
+        self.create_posts(posts)
+        self.create_comments(comments, posts)
+        self.create_follows(follows)
+        self.finish(feed)
+
+    def batches(self, label, total):
+        """Размеры пачек; каждая пишется в своей транзакции."""
+        done = 0
+        while done < total:
+            size = min(self.batch_size, total - done)
+            with transaction.atomic():
+                yield done, size
+            done += size
+            self.report(label, done, total)
+
+    def create_users(self, count):
+        first = _next_id(User)
+        password = make_password(PASSWORD)
+        names = [self.faker.user_name() for _ in range(POOL_SIZE)]
+        first_names = [self.faker.first_name() for _ in range(POOL_SIZE)]
+        last_names = [self.faker.last_name() for _ in range(POOL_SIZE)]
+        joined = _date(self.start - timedelta(days=1000))
+        choice = self.random.choice
+        for done, size in self.batches('Пользователи', count):
+            rows = [
+                (pk, password, False, f'{choice(names)}_{pk}',
+                 choice(first_names), choice(last_names), '', False, True,
+                 joined)
+                for pk in range(first + done, first + done + size)]
+            self.check_unique(User, 'username', [row[3] for row in rows])
+            insert_rows(User, (
+                'id', 'password', 'is_superuser', 'username', 'first_name',
+                'last_name', 'email', 'is_staff', 'is_active', 'date_joined',
+            ), rows)
+        return list(range(first, first + count))
+
+    def create_groups(self, count):
+        first = _next_id(Group)
+        rows = [(pk, self.faker.catch_phrase()[:200], f'group-{pk}',
+                 self.faker.paragraph(), 0)
+                for pk in range(first, first + count)]
+        self.check_unique(Group, 'slug', [row[2] for row in rows])
+        insert_rows(Group, ('id', 'title', 'slug', 'description',
+                            'post_count'), rows)
+        return [row[0] for row in rows]
+
+    @staticmethod
+    def check_unique(model, field, values):
+        """Ошибка, если значение уникального поля уже занято.
+
+        INSERT OR IGNORE молча пропустил бы такую строку, а посты и
+        подписки ссылались бы на ее id.
+        """
+        taken = list(model.objects.filter(**{f'{field}__in': values})
+                     .values_list(field, flat=True)[:5])
+        if taken:
+            raise SeedError(
+                f'{model._meta.verbose_name_plural}: {field} '
+                f'{", ".join(taken)} уже заняты')
+
+    def create_images(self, count):
+        """count разных картинок; посты ссылаются на них совместно."""
+        names = []
+        for _ in range(count):
+            image = Image.new('RGB', IMAGE_SIZE, self.color())
+            draw = ImageDraw.Draw(image)
+            for _ in range(8):
+                x, y = (self.random.randrange(size) for size in IMAGE_SIZE)
+                draw.ellipse((x, y, x + 200, y + 200), fill=self.color())
+            buffer = io.BytesIO()
+            image.save(buffer, 'JPEG', quality=80)
+            names.append(post_image_storage.save(
+                'posts/seed.jpg', ContentFile(buffer.getvalue())))
+        return names
+
+    def color(self):
+        return tuple(self.random.randrange(256) for _ in range(3))
+
+    def post_date(self, index, total):
+        """Посты равномерно распределены по периоду и упорядочены по id."""
+        return self.start + (self.end - self.start) * index / total
+
+    def create_posts(self, total):
+        rng = self.random
+        for done, size in self.batches('Посты', total):
+            authors = rng.choices(self.authors,
+                                  cum_weights=self.author_weights, k=size)
+            insert_rows(Post, (
+                'id', 'author', 'group', 'text', 'pub_date', 'image',
+                'comment_count',
+            ), [
+                (self.first_post + index, author,
+                 rng.choice(self.group_ids)
+                 if self.group_ids and rng.random() < .6 else None,
+                 ' '.join(rng.sample(self.sentences, rng.randint(1, 6))),
+                 _date(self.post_date(index, total)),
+                 rng.choice(self.images)
+                 if rng.random() < self.image_share else '',
+                 0)
+                for index, author in enumerate(authors, done)])
+
+    def create_comments(self, total, posts):
+        if not posts:
+            return
+        rng = self.random
+        first = _next_id(Comment)
+        for done, size in self.batches('Комментарии', total):
+            rows = []
+            for pk in range(first + done, first + done + size):
+                index = rng.randrange(posts)
+                published = self.post_date(index, posts)
+                delay = (self.end - published) * rng.random() ** 4
+                rows.append((
+                    pk, self.first_post + index, rng.choice(self.user_ids),
+                    rng.choice(self.sentences), _date(published + delay)))
+            insert_rows(Comment, ('id', 'post', 'author', 'text',
+                                  'pub_date'), rows)
+
+    def create_follows(self, mean):
+        """В среднем mean подписок на пользователя, авторы по Ципфу."""
+        if len(self.user_ids) < 2:
+            return
+        rng = self.random
+        users = iter(self.user_ids)
+        for _, size in self.batches('Подписчики', len(self.user_ids)):
+            rows = []
+            for user in (next(users) for _ in range(size)):
+                count = min(int(rng.expovariate(1 / mean)) if mean else 0,
+                            len(self.authors) - 1)
+                authors = set(rng.choices(
+                    self.authors, cum_weights=self.author_weights,
+                    k=count))
+                authors.discard(user)
+                rows.extend((user, author) for author in authors)
+            insert_rows(Follow, ('user', 'author'), rows)
+
+    def finish(self, feed):
+        total = Post.objects.count()
+        for done in rebuild_index():
+            self.report('Поисковый индекс', done, total)
+        sync_fan_in()
+        if feed:
+            self.build_feed()
+        with transaction.atomic():
+            recount()
+        bump('index')
+
+    def build_feed(self):
+        """Ленты подписок по всем новым подпискам (backfill_follows)."""
+        follows = Follow.objects.filter(
+            user_id__gte=self.user_ids[0]).order_by('author_id', 'user_id')
+        total = follows.count()
+        done = 0
+        while done < total:
+            # Подписки по автору идут подряд: запрос за постами автора
+            # делается почти всегда один раз.
+            chunk = list(follows[done:done + FEED_CHUNK_SIZE])
+            with transaction.atomic():
+                backfill_follows(chunk)
+            done += len(chunk)
+            self.report('Ленты подписок', done, total)
@@ -0,0 +1,201 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import counters
+from .cache import bump, group_id_key, post_author_key, user_id_key
+from .feed import backfill_follow, fan_out_post, trim_follow, update_fan_in
+from .media import schedule_release
+from .models import Comment, Follow, Group, Post
+from .search import index_post, unindex_post
+from .thumbnails import schedule_thumbnails
+
+User = get_user_model()
+
+# Поля пользователя, которые видны в лентах и комментариях.
+DISPLAY_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        fan_out_post(instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_values(sender, instance, raw=False, **kwargs):
+    # При смене группы пост должен пропасть из ленты старой группы,
+    # для новой картинки нужно заново создать миниатюры, а новый текст -
+    # проиндексировать.
+    if instance.pk and not raw:
+        (instance._previous_group_id, instance._previous_image,
+         instance._previous_text, instance._previous_author_id) = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', 'image', 'text', 'author_id').first()
+            or (None, None, None, None)
+        )
+
+
+@receiver(post_save, sender=Post)
+def post_counted(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.change_user(instance.author_id, 'posts_count', 1)
+        counters.change_group(instance.group_id, 1)
+        return
+    previous_author = getattr(instance, '_previous_author_id', None)
+    if previous_author and previous_author != instance.author_id:
+        counters.change_user(previous_author, 'posts_count', -1)
+        counters.change_user(instance.author_id, 'posts_count', 1)
+    previous_group = getattr(instance, '_previous_group_id', None)
+    if previous_group != instance.group_id:
+        counters.change_group(previous_group, -1)
+        counters.change_group(instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_uncounted(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, 'posts_count', -1)
+    counters.change_group(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Post)
+def post_text_saved(sender, instance, created, **kwargs):
+    if created or instance.text != getattr(instance, '_previous_text', None):
+        index_post(instance.pk, instance.text)
+
+
+@receiver(post_save, sender=Post)
+def post_image_saved(sender, instance, raw=False, **kwargs):
+    name = instance.image.name
+    previous = getattr(instance, '_previous_image', None)
+    if raw or name == previous:
+        return
+    if name:
+        schedule_thumbnails(name)
+    schedule_release(previous)
+
+
+@receiver(post_delete, sender=Post)
+def post_image_deleted(sender, instance, **kwargs):
+    schedule_release(instance.image.name)
+
+
+@receiver(post_delete, sender=Post)
+def post_unindexed(sender, instance, **kwargs):
+    unindex_post(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_changed(sender, instance, **kwargs):
+    group_ids = {instance.group_id,
+                 getattr(instance, '_previous_group_id', None)}
+    bump(
+        'index',
+        f'author:{instance.author_id}',
+        f'post:{instance.pk}',
+        *(f'group:{group_id}' for group_id in group_ids if group_id),
+    )
+    cache.delete(post_author_key(instance.pk))
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    bump(f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        backfill_follow(instance)
+        counters.change_user(instance.author_id, 'followers_count', 1)
+        counters.change_user(instance.user_id, 'following_count', 1)
+        update_fan_in(instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    trim_follow(instance)
+    counters.change_user(instance.author_id, 'followers_count', -1)
+    counters.change_user(instance.user_id, 'following_count', -1)
+    update_fan_in(instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    bump(f'follow:{instance.user_id}', f'followers:{instance.author_id}')
+
+
+@receiver(pre_save, sender=Group)
+def remember_previous_slug(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        instance._previous_slug = Group.objects.filter(
+            pk=instance.pk).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    bump(f'group:{instance.pk}')
+    # id по slug запомнен валидатором страницы группы: slug мог достаться
+    # другой группе.
+    slugs = {instance.slug, getattr(instance, '_previous_slug', None)}
+    cache.delete_many([group_id_key(slug) for slug in slugs if slug])
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def remember_previous_names(sender, instance, raw=False, update_fields=None,
+                            **kwargs):
+    if not instance.pk or raw or (
+            update_fields is not None
+            and not update_fields.intersection(DISPLAY_FIELDS)):
+        return
+    instance._previous_names = User.objects.filter(
+        pk=instance.pk).values_list(*DISPLAY_FIELDS).first()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    # Вход в систему сохраняет только last_login - страниц это не меняет.
+    if update_fields != frozenset({'last_login'}):
+        bump(f'author:{instance.pk}')
+        # То же для id по username у валидатора профиля.
+        previous = getattr(instance, '_previous_names', None)
+        usernames = {instance.username, previous and previous[0]}
+        cache.delete_many([user_id_key(name) for name in usernames if name])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_renamed(sender, instance, created, raw=False, **kwargs):
+    # Имя автора показано и в общих лентах, и в комментариях к чужим
+    # постам; у удаленного пользователя посты и комментарии удаляются
+    # каскадом и сами сбрасывают эти поколения.
+    previous = getattr(instance, '_previous_names', None)
+    if created or raw or previous is None or previous == tuple(
+            getattr(instance, field) for field in DISPLAY_FIELDS):
+        return
+    group_ids = Post.objects.filter(
+        author=instance, group__isnull=False).values_list(
+        'group_id', flat=True).distinct()
+    post_ids = Comment.objects.filter(author=instance).values_list(
+        'post_id', flat=True).distinct()
+    bump('index', *(f'group:{pk}' for pk in group_ids.iterator()),
+         *(f'post:{pk}' for pk in post_ids.iterator()))
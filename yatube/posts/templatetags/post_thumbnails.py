@@ -0,0 +1,42 @@
+from django import template
+from django.conf import settings
+from sorl.thumbnail import get_thumbnail
+
+from ..thumbnails import MIME_TYPES, thumbnail_formats
+from ..thumbnails import prefetch_thumbnails as prefetch
+
+register = template.Library()
+
+
+@register.simple_tag
+def prefetch_thumbnails(posts):
+    """Загружает миниатюры страницы до цикла с {% post_image %}."""
+    prefetch(posts)
+    return ''
+
+
+@register.inclusion_tag('posts/includes/post_image.html')
+def post_image(post):
+    """<picture> со всеми размерами картинки поста в каждом формате.
+
+    Браузер сам выбирает формат по <source type> и ширину по srcset и
+    sizes; последний формат из THUMBNAIL_FORMATS идет в запасной <img>.
+    """
+    sources = []
+    for format_ in thumbnail_formats():
+        candidates = []
+        for geometry in settings.THUMBNAIL_GEOMETRIES:
+            image = get_thumbnail(post.image, geometry, format=format_,
+                                  **settings.THUMBNAIL_OPTIONS)
+            candidates.append((image.url, geometry.split('x')[0]))
+        sources.append({
+            'type': MIME_TYPES.get(format_),
+            'srcset': ', '.join(f'{url} {width}w'
+                                for url, width in candidates),
+            'src': candidates[-1][0],
+        })
+    return {
+        'sources': sources[:-1],
+        'fallback': sources[-1],
+        'sizes': settings.THUMBNAIL_SIZES,
+    }
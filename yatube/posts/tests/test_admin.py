@@ -0,0 +1,55 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+USERS_COUNT: int = 30
+
+
+class AdminAutocompleteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        User.objects.bulk_create(
+            User(username=f'user{i:02}') for i in range(USERS_COUNT))
+        cls.group = Group.objects.create(title='Котики', slug='cats',
+                                         description='Описание')
+        cls.post = Post.objects.create(author=cls.admin, group=cls.group,
+                                       text='Пост про котиков')
+        cls.comment = Comment.objects.create(post=cls.post, author=cls.admin,
+                                             text='Комментарий')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def test_change_forms_do_not_list_related_rows(self):
+        """Формы не выводят всех пользователей и посты в <select>."""
+        urls = (
+            reverse('admin:posts_comment_change', args=[self.comment.pk]),
+            reverse('admin:posts_post_change', args=[self.post.pk]),
+            reverse('admin:posts_follow_add'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                content = self.client.get(url).content.decode()
+                self.assertIn('admin-autocomplete', content)
+                self.assertNotIn('user05', content)
+
+    def test_prefix_search(self):
+        """Автодополнение ищет по началу логина и названия группы."""
+        cases = (
+            ('admin:auth_user_autocomplete', 'user1', 10),
+            ('admin:auth_user_autocomplete', 'ser', 0),
+            ('admin:posts_group_autocomplete', 'Кот', 1),
+            ('admin:posts_post_autocomplete', 'котик', 1),
+        )
+        for url, term, expected in cases:
+            with self.subTest(url=url, term=term):
+                response = self.client.get(reverse(url), {'term': term})
+                self.assertEqual(len(response.json()['results']), expected)
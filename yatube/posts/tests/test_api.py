@@ -0,0 +1,109 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+POSTS_COUNT: int = 13
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        for i in range(POSTS_COUNT):
+            Post.objects.create(author=cls.user, group=cls.group,
+                                text=f'Пост {i}')
+        cls.post = Post.objects.latest('pub_date', 'pk')
+        Comment.objects.create(post=cls.post, author=cls.user,
+                               text='Комментарий')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_feeds_are_cursor_paginated(self):
+        """Ленты отдают JSON по курсору без пересечений страниц."""
+        urls = (
+            reverse('posts:api_index'),
+            reverse('posts:api_group_list', args=[self.group.slug]),
+            reverse('posts:api_profile', args=[self.user.username]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                first = self.client.get(url).json()
+                self.assertEqual(len(first['results']), 10)
+                self.assertEqual(first['results'][0]['id'], self.post.pk)
+                second = self.client.get(first['next']).json()
+                self.assertEqual(len(second['results']), POSTS_COUNT - 10)
+                self.assertIsNone(second['next'])
+
+    def test_not_modified_without_page_query(self):
+        """Повторный запрос с ETag получает 304 без запросов за постами."""
+        url = reverse('posts:api_index')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+        with self.assertNumQueries(0):
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, HTTPStatus.NOT_MODIFIED)
+        with self.assertNumQueries(0):
+            cached = self.client.get(
+                url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(cached.status_code, HTTPStatus.NOT_MODIFIED)
+
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, HTTPStatus.OK)
+        self.assertNotEqual(changed['ETag'], etag)
+
+    def test_group_and_profile_not_modified_without_queries(self):
+        """304 группы и автора не ищет их в БД, как и HTML-страницы."""
+        for url in (reverse('posts:api_group_list', args=[self.group.slug]),
+                    reverse('posts:api_profile', args=[self.user.username])):
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with self.assertNumQueries(0):
+                    cached = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(cached.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+
+    def test_post_detail_follows_author_name(self):
+        """Новое имя автора меняет ETag поста: оно есть в ответе."""
+        url = reverse('posts:api_post_detail', args=[self.post.pk])
+        etag = self.client.get(url)['ETag']
+        self.user.first_name = 'Новое'
+        self.user.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.json()['author']['full_name'], 'Новое')
+
+    def test_post_detail(self):
+        """Пост отдается с комментариями; новый комментарий меняет ETag."""
+        url = reverse('posts:api_post_detail', args=[self.post.pk])
+        response = self.client.get(url)
+        data = response.json()
+        self.assertEqual(data['comment_count'], 1)
+        self.assertEqual(data['comments'][0]['text'], 'Комментарий')
+        Comment.objects.create(post=self.post, author=self.user, text='Еще')
+        again = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, HTTPStatus.OK)
+        self.assertEqual(len(again.json()['comments']), 2)
+
+    def test_missing_objects(self):
+        """Несуществующие группа, автор и пост дают 404."""
+        urls = (
+            reverse('posts:api_group_list', args=['missing']),
+            reverse('posts:api_profile', args=['missing']),
+            reverse('posts:api_post_detail', args=[0]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code,
+                                 HTTPStatus.NOT_FOUND)
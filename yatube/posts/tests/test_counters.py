@@ -0,0 +1,97 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class CounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.other_group = Group.objects.create(title='Другая', slug='other',
+                                               description='Описание')
+
+    def assertCounters(self, post=None, posts=0, followers=0, following=0,
+                       group_posts=0, comments=0):
+        stats = UserStats.objects.filter(pk=self.author.pk).values_list(
+            'posts_count', 'followers_count').first() or (0, 0)
+        reader = UserStats.objects.filter(pk=self.reader.pk).values_list(
+            'following_count', flat=True).first() or 0
+        self.group.refresh_from_db()
+        self.assertEqual(stats, (posts, followers))
+        self.assertEqual(reader, following)
+        self.assertEqual(self.group.post_count, group_posts)
+        if post is not None:
+            post.refresh_from_db()
+            self.assertEqual(post.comment_count, comments)
+
+    def test_counters_follow_writes(self):
+        """Счетчики меняются вместе с постами, комментариями и подписками."""
+        post = Post.objects.create(author=self.author, group=self.group,
+                                   text='Пост')
+        Comment.objects.create(post=post, author=self.reader, text='Да')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertCounters(post, posts=1, followers=1, following=1,
+                            group_posts=1, comments=1)
+
+        post.group = self.other_group
+        post.save()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.other_group.post_count, 1)
+        self.assertCounters(post, posts=1, followers=1, following=1,
+                            comments=1)
+
+        post.comments.all().delete()
+        Follow.objects.all().delete()
+        self.assertCounters(post, posts=1)
+        post.delete()
+        self.assertCounters()
+
+    def test_stale_save_keeps_counters(self):
+        """Сохранение устаревшего объекта не затирает счетчики."""
+        post = Post.objects.create(author=self.author, group=self.group,
+                                   text='Пост')
+        stale_post = Post.objects.defer('text').get(pk=post.pk)
+        stale_group = Group.objects.get(pk=self.group.pk)
+        Comment.objects.create(post=post, author=self.reader, text='Да')
+        Post.objects.create(author=self.author, group=self.group,
+                            text='Еще пост')
+
+        stale_post.text = 'Правка'
+        stale_post.save()
+        Post.objects.get(pk=post.pk).save()
+        stale_group.title = 'Новое название'
+        stale_group.save()
+        self.assertEqual(Post.objects.get(pk=post.pk).text, 'Правка')
+        self.assertCounters(post, posts=2, group_posts=2, comments=1)
+
+        post.comments.all().delete()
+        self.assertCounters(post, posts=2, group_posts=2)
+
+    def test_delete_uncounted_post(self):
+        """Удаление поста, созданного в обход сигналов, не уходит в минус."""
+        Post.objects.bulk_create(
+            [Post(author=self.author, group=self.group, text='Пост')])
+        Comment.objects.bulk_create(
+            [Comment(post=Post.objects.get(), author=self.reader,
+                     text='Да')])
+        Comment.objects.get().delete()
+        Post.objects.get().delete()
+        self.assertCounters()
+
+    def test_recount_command(self):
+        """Команда исправляет счетчики после записей в обход моделей."""
+        Post.objects.bulk_create(
+            Post(author=self.author, group=self.group, text=f'Пост {i}')
+            for i in range(3))
+        UserStats.objects.create(user=self.reader, following_count=5)
+        call_command('recount_counters', stdout=StringIO())
+        self.assertCounters(posts=3, group_posts=3)
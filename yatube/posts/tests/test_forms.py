@@ -1,14 +1,18 @@
+import hashlib
 import shutil
 import tempfile
 from http import HTTPStatus
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from ..models import Comment, Group, Post
+from ..uploads import EXIF_ORIENTATION
 
 User = get_user_model()
 
@@ -69,6 +73,7 @@ class PostCreateFormTests(TestCase):
             data=form_data,
             follow=True
         )
+        digest = hashlib.sha256(small_gif).hexdigest()
         error_name1 = 'Данные поста не совпадают'
         error_name2 = 'Поcт не добавлен в базу данных'
         self.assertEqual(response.status_code, HTTPStatus.OK)
@@ -76,13 +81,32 @@ class PostCreateFormTests(TestCase):
             text=form_data['text'],
             group=form_data['group'],
             author=self.user,
-            image='posts/small.gif'
+            image=f'posts/{digest[:2]}/{digest[2:4]}/{digest}.gif'
         ).exists(), error_name1)
         self.assertRedirects(response,
                              (reverse('posts:profile', kwargs={
                                  'username': self.user.username})))
         self.assertEqual(Post.objects.count(), posts_count + 1, error_name2)
 
+    @override_settings(POST_IMAGE_MAX_SIZE=(200, 200))
+    def test_large_photo_is_normalized(self):
+        """Фото поворачивается по EXIF, уменьшается и теряет метаданные."""
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION] = 6
+        buffer = BytesIO()
+        Image.new('RGB', (600, 300), 'red').save(buffer, 'JPEG',
+                                                 exif=exif.tobytes())
+        uploaded = SimpleUploadedFile('photo.jpg', buffer.getvalue(),
+                                      content_type='image/jpeg')
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с фото', 'image': uploaded},
+        )
+        post = Post.objects.get(text='Пост с фото')
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (100, 200))
+            self.assertNotIn('exif', image.info)
+
     def test_changing_post(self):
         """Валидная форма изменяет конкретную запись в Post."""
         posts_count = Post.objects.count()
@@ -0,0 +1,133 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from sorl.thumbnail import default
+
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def stored_files(directory='posts'):
+    found = []
+    for root, _, files in os.walk(os.path.join(TEMP_MEDIA_ROOT, directory)):
+        found += [os.path.relpath(os.path.join(root, name), TEMP_MEDIA_ROOT)
+                  for name in files]
+    return sorted(found)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0,
+                   THUMBNAIL_PROCESSES=0, MEDIA_RELEASE_GRACE=0)
+class ContentAddressedMediaTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        default.kvstore.lru.clear()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        self.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, name='small.gif', content=SMALL_GIF):
+        return Post.objects.create(
+            author=self.user, text='Пост с картинкой',
+            image=SimpleUploadedFile(name, content))
+
+    def test_identical_uploads_stored_once(self):
+        """Одинаковые загрузки хранятся одним файлом с одним именем."""
+        first = self.create_post('small.gif')
+        second = self.create_post('копия.GIF')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(stored_files(), [first.image.name])
+
+    def test_shared_file_deleted_with_last_reference(self):
+        """Общий файл и его миниатюры удаляются вместе с последним постом."""
+        first = self.create_post()
+        second = self.create_post()
+        first.delete()
+        self.assertEqual(len(stored_files()), 1)
+        second.delete()
+        self.assertEqual(stored_files(), [])
+        self.assertEqual(
+            [files for _, _, files in os.walk(
+                os.path.join(TEMP_MEDIA_ROOT, 'cache')) if files], [])
+
+    @override_settings(MEDIA_RELEASE_GRACE=3600)
+    def test_recently_saved_file_kept(self):
+        """Только что сохраненный файл не удаляется: он может быть нужен."""
+        self.create_post().delete()
+        self.assertEqual(len(stored_files()), 1)
+
+    def test_dedupe_command(self):
+        """Команда сводит старые копии с суффиксами к одному файлу."""
+        legacy = FileSystemStorage()
+        for name in ('posts/картинка.gif', 'posts/картинка_2u9sbbY.gif'):
+            legacy.save(name, ContentFile(SMALL_GIF))
+            Post.objects.create(author=self.user, text='Старый пост',
+                                image=name)
+        out = StringIO()
+        call_command('dedupe_post_images', stdout=out)
+        self.assertIn('уникальных: 1', out.getvalue())
+        self.assertIn(f'Освобождено: {len(SMALL_GIF)} байт', out.getvalue())
+        self.assertEqual(len(stored_files()), 1)
+        self.assertEqual(
+            Post.objects.values('image').distinct().count(), 1)
+
+    def test_shard_command(self):
+        """Команда переносит плоские файлы в posts/ab/cd/ без потерь."""
+        digest = hashlib.sha256(SMALL_GIF).hexdigest()
+        flat = f'posts/{digest}.gif'
+        FileSystemStorage().save(flat, ContentFile(SMALL_GIF))
+        post = Post.objects.create(author=self.user, text='Старый пост',
+                                   image=flat)
+        for _ in range(2):
+            call_command('shard_post_images', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.image.name,
+                         f'posts/{digest[:2]}/{digest[2:4]}/{digest}.gif')
+        self.assertEqual(stored_files(), [post.image.name])
+
+    def test_collect_media_command(self):
+        """Сборщик удаляет файлы без ссылок вместе с их миниатюрами."""
+        kept = self.create_post()
+        orphan = self.create_post('other.gif', SMALL_GIF + b'\x00')
+        Post.objects.filter(pk=orphan.pk).update(image='')
+        FileSystemStorage().save('cache/aa/bb/stray.jpg',
+                                 ContentFile(SMALL_GIF))
+        thumbnails = stored_files('cache')
+        self.assertGreater(len(thumbnails), 1)
+
+        out = StringIO()
+        call_command('collect_media', dry_run=True, grace=0, rate=0,
+                     stdout=out)
+        self.assertIn('Картинок: 1', out.getvalue())
+        self.assertEqual(stored_files('cache'), thumbnails)
+
+        call_command('collect_media', grace=0, rate=0, stdout=StringIO())
+        self.assertEqual(stored_files(), [kept.image.name])
+        remaining = stored_files('cache')
+        self.assertNotIn('cache/aa/bb/stray.jpg', remaining)
+        self.assertEqual(len(remaining), (len(thumbnails) - 1) // 2)
@@ -0,0 +1,218 @@
+import shutil
+import tempfile
+from http import HTTPStatus
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from sorl.thumbnail import default
+
+from ..admin import PostAdmin
+from ..models import Comment, Follow, Group, Post
+from ..thumbnails import generate_thumbnails
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+USERS_COUNT: int = 5
+POSTS_PER_USER: int = 12
+COMMENTS_COUNT: int = 15
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, QUERY_COUNT_HEADERS=True,
+                   THUMBNAIL_PROCESSES=0)
+class QueryBudgetTests(TestCase):
+    """Бюджет запросов к БД для каждого адреса проекта.
+
+    Данные похожи на настоящие: у постов есть группы, картинки, комментарии
+    разных авторов и подписчики. Если шаблон начнет делать запрос на
+    каждый объект, страница выйдет за бюджет.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = [
+            User.objects.create_user(
+                username=f'user{i}', first_name='Имя', last_name=f'{i}')
+            for i in range(USERS_COUNT)
+        ]
+        cls.user = cls.users[0]
+        cls.groups = [
+            Group.objects.create(title=f'Группа {i}', slug=f'group-{i}',
+                                 description='Описание')
+            for i in range(2)
+        ]
+        for user in cls.users[1:]:
+            Follow.objects.create(user=cls.user, author=user)
+        for i in range(POSTS_PER_USER):
+            for number, user in enumerate(cls.users):
+                Post.objects.create(
+                    author=user,
+                    group=cls.groups[(i + number) % 2] if i % 3 else None,
+                    text=f'Тестовый пост {i}',
+                    image=SimpleUploadedFile(
+                        name='small.gif', content=SMALL_GIF,
+                        content_type='image/gif') if i % 4 == 0 else None,
+                )
+        # В TestCase on_commit не срабатывает: готовим миниатюры так же,
+        # как это сделал бы фоновый пул после сохранения. Имена картинок
+        # постоянные, поэтому кэш чистим до этого.
+        cache.clear()
+        default.kvstore.lru.clear()
+        for name in Post.objects.exclude(image='').values_list('image',
+                                                               flat=True):
+            generate_thumbnails(name)
+        cls.post = Post.objects.filter(author=cls.user).first()
+        for i in range(COMMENTS_COUNT):
+            Comment.objects.create(post=cls.post, text=f'Комментарий {i}',
+                                   author=cls.users[i % USERS_COUNT])
+        cls.reset_url = reverse('users:password_reset_confirm', kwargs={
+            'uidb64': urlsafe_base64_encode(force_bytes(cls.user.pk)),
+            'token': default_token_generator.make_token(cls.user),
+        })
+        author = cls.users[1].username
+        # Адрес: (авторизован ли клиент, бюджет запросов).
+        cls.budgets: dict = {
+            reverse('posts:index'): (False, 2),
+            # При пустом кэше валидатор условного ответа сначала ищет id
+            # группы, автора или автора поста: плюс один запрос.
+            reverse('posts:group_list',
+                    kwargs={'slug': cls.groups[0].slug}): (False, 5),
+            reverse('posts:profile', kwargs={'username': author}): (False, 5),
+            reverse('posts:post_detail',
+                    kwargs={'post_id': cls.post.id}): (False, 3),
+            reverse('posts:post_create'): (True, 3),
+            reverse('posts:post_edit',
+                    kwargs={'post_id': cls.post.id}): (True, 5),
+            reverse('posts:add_comment',
+                    kwargs={'post_id': cls.post.id}): (True, 3),
+            reverse('posts:follow_index'): (True, 5),
+            reverse('posts:profile_follow',
+                    kwargs={'username': author}): (True, 4),
+            # Отписка меняет два счетчика в UserStats и сверяет флаг
+            # fan-in автора.
+            reverse('posts:profile_unfollow',
+                    kwargs={'username': author}): (True, 8),
+            reverse('users:signup'): (False, 0),
+            reverse('users:login'): (False, 0),
+            reverse('users:logout'): (True, 4),
+            reverse('users:password_change'): (True, 2),
+            reverse('users:password_change_done'): (True, 2),
+            reverse('users:password_reset'): (False, 0),
+            reverse('users:password_reset_done'): (False, 0),
+            cls.reset_url: (False, 1),
+            reverse('users:password_reset_complete'): (False, 0),
+            reverse('about:author'): (False, 0),
+            reverse('about:tech'): (False, 0),
+            reverse('posts:search') + '?q=пост': (False, 3),
+            # Проверка, что пост есть, и страница комментариев.
+            reverse('posts:post_comments',
+                    kwargs={'post_id': cls.post.id}): (False, 2),
+            # JSON-ленты курсорные: без COUNT(*) и окна номеров страниц.
+            reverse('posts:api_index'): (False, 1),
+            reverse('posts:api_group_list',
+                    kwargs={'slug': cls.groups[0].slug}): (False, 2),
+            reverse('posts:api_profile', kwargs={'username': author}): (
+                False, 2),
+            reverse('posts:api_post_detail',
+                    kwargs={'post_id': cls.post.id}): (False, 3),
+            reverse('posts:api_follow_index'): (True, 5),
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_query_budget(self):
+        """Каждый адрес укладывается в свой бюджет запросов."""
+        for url, (authorized, budget) in self.budgets.items():
+            with self.subTest(url=url):
+                cache.clear()
+                default.kvstore.lru.clear()
+                client = Client()
+                if authorized:
+                    client.force_login(self.user)
+                response = client.get(url)
+                self.assertLess(response.status_code,
+                                HTTPStatus.BAD_REQUEST)
+                count = int(response['X-Query-Count'])
+                self.assertLessEqual(
+                    count, budget,
+                    f'{url} делает {count} запросов при бюджете {budget}'
+                )
+
+    def test_budget_does_not_grow_with_page_size(self):
+        """Число запросов ленты не зависит от числа постов на странице."""
+        url = reverse('posts:profile',
+                      kwargs={'username': self.users[1].username})
+        client = Client()
+        cache.clear()
+        for page in (1, 2):
+            client.get(url, {'page': page})
+        full = client.get(url, {'page': 1})
+        short = client.get(url, {'page': 2})
+        self.assertEqual(len(full.context['page_obj']), 10)
+        self.assertEqual(len(short.context['page_obj']), 2)
+        self.assertEqual(full['X-Query-Count'], short['X-Query-Count'])
+
+    @override_settings(COMMENTS_PER_PAGE=10)
+    def test_comments_are_paginated(self):
+        """Пост выводит первые комментарии, остальные идут фрагментом."""
+        response = Client().get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        first = response.context['comments']
+        self.assertEqual(len(first), 10)
+        self.assertContains(response, 'js-more-comments')
+        fragment = Client().get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id}),
+            {'after': first.next_cursor})
+        rest = fragment.context['comments']
+        self.assertEqual(len(rest), COMMENTS_COUNT - 10)
+        self.assertFalse(rest.has_next())
+        self.assertFalse({c.pk for c in first} & {c.pk for c in rest})
+        self.assertNotContains(fragment, '<html')
+
+    def test_comments_of_missing_post(self):
+        """Фрагмент комментариев несуществующего поста - 404."""
+        response = Client().get(
+            reverse('posts:post_comments', kwargs={'post_id': 10 ** 6}))
+        self.assertEqual(response.status_code, 404)
+
+    @patch.object(PostAdmin, 'list_per_page', 10)
+    def test_admin_changelist_budget(self):
+        """Список постов в админке не делает запрос на строку."""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        client = Client()
+        client.force_login(admin)
+        cache.clear()
+        for page in (0, 3):
+            with self.subTest(page=page):
+                response = client.get(
+                    reverse('admin:posts_post_changelist'), {'p': page})
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertEqual(len(response.context['cl'].result_list), 10)
+                self.assertLessEqual(int(response['X-Query-Count']), 5)
+
+    @override_settings(QUERY_COUNT_HEADERS=False)
+    def test_headers_disabled(self):
+        """Без QUERY_COUNT_HEADERS счетчик не попадает в заголовки."""
+        response = Client().get(reverse('about:author'))
+        self.assertFalse(response.has_header('X-Query-Count'))
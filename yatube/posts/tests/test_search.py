@@ -0,0 +1,76 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Post
+from ..search import SearchPaginator, filter_matching
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        for i in range(12):
+            Post.objects.create(author=cls.user,
+                                text=f'Пост про котов номер {i}')
+
+    def setUp(self):
+        self.client = Client()
+        self.post = Post.objects.create(
+            author=self.user, text='Котики <b>и</b> собаки на прогулке')
+
+    def search(self, query, **params):
+        return self.client.get(reverse('posts:search'),
+                               {'q': query, **params})
+
+    def test_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при правке и удалении поста."""
+        self.assertEqual(SearchPaginator('собаки', 10).count, 1)
+        self.post.text = 'Только кошки'
+        self.post.save()
+        self.assertEqual(SearchPaginator('собаки', 10).count, 0)
+        self.assertEqual(SearchPaginator('кошки', 10).count, 1)
+        self.post.delete()
+        self.assertEqual(SearchPaginator('кошки', 10).count, 0)
+
+    def test_filter_matching_keeps_all_matches(self):
+        """Фильтр админки оставляет все подходящие посты."""
+        self.assertEqual(
+            filter_matching(Post.objects.all(), 'котов').count(), 12)
+
+    def test_snippet_is_highlighted_and_escaped(self):
+        """Найденное слово выделено, HTML из текста поста экранирован."""
+        response = self.search('собаки')
+        self.assertContains(response, '<mark>собаки</mark>')
+        self.assertContains(response, '&lt;b&gt;и&lt;/b&gt;')
+        self.assertNotContains(response, '<b>и</b>')
+
+    def test_cursor_pagination_keeps_query(self):
+        """Страницы результатов идут курсором и не теряют запрос."""
+        first = self.search('кот')
+        page_obj = first.context['page_obj']
+        self.assertEqual(len(page_obj), 10)
+        self.assertContains(first, 'q=%D0%BA%D0%BE%D1%82&amp;after=')
+        second = self.search('кот', after=page_obj.next_cursor)
+        seen = {post.pk for post in page_obj}
+        rest = {post.pk for post in second.context['page_obj']}
+        self.assertEqual(len(rest), 3)
+        self.assertFalse(seen & rest)
+
+    def test_query_syntax_is_not_interpreted(self):
+        """Синтаксис FTS5 во вводе не приводит к ошибке."""
+        for query in ('"', 'NEAR(', 'text:кот', '*', ''):
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query).status_code, 200)
+
+    def test_rebuild_command(self):
+        """Команда заново индексирует посты, измененные в обход модели."""
+        Post.objects.filter(pk=self.post.pk).update(text='Попугаи')
+        self.assertEqual(SearchPaginator('попугаи', 10).count, 0)
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(SearchPaginator('попугаи', 10).count, 1)
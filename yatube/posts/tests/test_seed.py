@@ -0,0 +1,76 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from ..models import Comment, FeedEntry, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def seed(self):
+        call_command('seed_data', users=30, groups=3, posts=200,
+                     comments=100, follows=4, images=2, image_share=.5,
+                     batch_size=64, stdout=StringIO())
+
+    def test_seed_data(self):
+        """Команда создает связные данные с посчитанными счетчиками."""
+        self.seed()
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(FeedEntry.objects.exists())
+        self.assertEqual(
+            Post.objects.exclude(image='').values('image').distinct().count(),
+            2)
+        self.assertEqual(
+            sum(UserStats.objects.values_list('posts_count', flat=True)),
+            200)
+        self.assertTrue(self.client.login(
+            username=User.objects.first().username,
+            password='seed-password'))
+
+    def test_seed_is_reproducible(self):
+        """Тот же seed дает те же тексты, даты и распределение авторов."""
+        def snapshot():
+            posts = Post.objects.order_by('pk')
+            return (list(posts.values_list('text', 'pub_date')),
+                    UserStats.objects.order_by(
+                        '-posts_count').values_list('posts_count',
+                                                    flat=True)[:3])
+
+        self.seed()
+        first = snapshot()
+        Post.objects.all().delete()
+        User.objects.all().delete()
+        self.seed()
+        self.assertEqual(snapshot()[0], first[0])
+        self.assertEqual(list(snapshot()[1]), list(first[1]))
+
+    def test_slug_conflict_fails(self):
+        """Занятый slug группы останавливает наполнение до записи данных."""
+        Group.objects.create(title='Своя', slug='group-2',
+                             description='Описание')
+        with self.assertRaisesMessage(CommandError, 'group-2'):
+            self.seed()
+        self.assertFalse(User.objects.exists())
+        self.assertEqual(Group.objects.count(), 1)
@@ -0,0 +1,122 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from PIL import features
+from sorl.thumbnail import default, get_thumbnail
+
+from ..models import Post
+from ..thumbnails import (encode_variants, generate_thumbnails,
+                          get_process_pool, prefetch_thumbnails,
+                          thumbnail_variants)
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def thumbnail_files():
+    found = []
+    for root, _, files in os.walk(os.path.join(TEMP_MEDIA_ROOT, 'cache')):
+        found += files
+    return found
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0,
+                   THUMBNAIL_PROCESSES=0)
+class ThumbnailPipelineTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        default.kvstore.lru.clear()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        self.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self):
+        return Post.objects.create(
+            author=self.user, text='Пост с картинкой',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'))
+
+    def test_thumbnails_created_on_save(self):
+        """Миниатюры создаются при сохранении поста, а не при показе."""
+        self.create_post()
+        self.assertEqual(len(thumbnail_files()),
+                         len(thumbnail_variants()))
+
+    def test_locked_image_is_skipped(self):
+        """Картинку, которую уже обрабатывает другой воркер, не трогают."""
+        with self.settings(THUMBNAIL_GEOMETRIES=[]):
+            post = self.create_post()
+        cache.add(f'thumbnail-lock:{post.image.name}', 1)
+        self.assertFalse(generate_thumbnails(post.image.name))
+        self.assertEqual(thumbnail_files(), [])
+
+    def test_backfill_command(self):
+        """Команда создает миниатюры для уже загруженных картинок."""
+        with self.settings(THUMBNAIL_GEOMETRIES=[]):
+            self.create_post()
+        out = StringIO()
+        call_command('generate_thumbnails', stdout=out)
+        self.assertIn('Готово: 1, с ошибками: 0', out.getvalue())
+        self.assertEqual(len(thumbnail_files()),
+                         len(thumbnail_variants()))
+
+    def test_prefetch_batches_lookups(self):
+        """Миниатюры страницы читаются одним запросом, а не по одной."""
+        posts = [self.create_post() for _ in range(3)]
+        default.kvstore.lru.clear()
+        cache.clear()
+        with self.assertNumQueries(1):
+            prefetch_thumbnails(posts)
+        with self.assertNumQueries(0):
+            for post in posts:
+                for geometry, options in thumbnail_variants():
+                    thumbnail = get_thumbnail(post.image, geometry, **options)
+                    self.assertTrue(thumbnail.exists())
+
+    @override_settings(THUMBNAIL_FORMATS=['WEBP', 'JPEG'])
+    def test_post_image_srcset(self):
+        """Страница поста отдает все ширины в srcset и запасной JPEG."""
+        post = self.create_post()
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.id}))
+        content = response.content.decode()
+        for geometry in settings.THUMBNAIL_GEOMETRIES:
+            width = geometry.split('x')[0]
+            with self.subTest(width=width):
+                self.assertIn(f'.jpg {width}w', content)
+        self.assertEqual(
+            '<source type="image/webp"' in content, features.check('webp'))
+
+    @override_settings(THUMBNAIL_PROCESSES=1)
+    def test_encode_in_process_pool(self):
+        """Сжатие в пуле процессов дает те же варианты, что и в потоке."""
+        variants = [(geometry, dict(options, quality=95))
+                    for geometry, options in thumbnail_variants()]
+        local_size, local = encode_variants(SMALL_GIF, variants)
+        pool = get_process_pool()
+        size, results = pool.submit(
+            encode_variants, SMALL_GIF, variants).result()
+        self.assertEqual(size, local_size)
+        self.assertEqual([size for _, size in results],
+                         [size for _, size in local])
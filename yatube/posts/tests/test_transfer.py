@@ -0,0 +1,184 @@
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from ..cache import generation
+from ..models import Comment, FeedEntry, Follow, Group, Post, UserStats
+from ..search import filter_matching
+
+User = get_user_model()
+
+
+class TransferTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.path = os.path.join(self.directory, 'dump.jsonl')
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(title='Группа', slug='group',
+                                     description='Описание')
+        self.post = Post.objects.create(author=author, group=group,
+                                        text='Первый пост про котов')
+        Post.objects.create(author=reader, text='Второй пост')
+        Comment.objects.create(post=self.post, author=reader,
+                               text='Комментарий')
+        Follow.objects.create(user=reader, author=author)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def export(self, *args):
+        call_command('export_jsonl', '-o', self.path, *args,
+                     stderr=StringIO())
+        with open(self.path, encoding='utf-8') as file:
+            return [json.loads(line) for line in file]
+
+    def load(self, *args):
+        call_command('import_jsonl', self.path, *args, stdout=StringIO())
+
+    def test_round_trip(self):
+        """Выгруженные данные загружаются обратно без потерь."""
+        rows = self.export()
+        self.assertEqual([row['model'] for row in rows],
+                         ['group', 'post', 'post', 'comment', 'follow'])
+        pub_date = self.post.pub_date
+        User.objects.all().delete()
+        Group.objects.all().delete()
+
+        self.load()
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.pub_date, pub_date)
+        self.assertEqual(post.author.username, 'author')
+        self.assertEqual(post.group.slug, 'group')
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertTrue(Comment.objects.filter(
+            post=post, author__username='reader').exists())
+        self.assertEqual(
+            UserStats.objects.get(user__username='author').followers_count,
+            1)
+        self.assertEqual(Group.objects.get().post_count, 1)
+        self.assertIn(post, filter_matching(Post.objects.all(), 'кот'))
+        self.assertTrue(FeedEntry.objects.filter(
+            user__username='reader', post=post).exists())
+
+    def test_import_is_resumable(self):
+        """Повтор загрузки и --offset не создают дублей."""
+        self.export()
+        Comment.objects.all().delete()
+        self.load('--offset', '3')
+        self.load('--offset', '3')
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(Post.objects.count(), 2)
+
+    def test_export_offset_appends(self):
+        """Выгрузка с --offset дописывает оставшиеся строки."""
+        full = self.export()
+        with open(self.path, 'w', encoding='utf-8') as file:
+            file.writelines(
+                json.dumps(row, ensure_ascii=False) + '\n'
+                for row in full[:2])
+        self.assertEqual(self.export('--offset', '2'), full)
+
+    def test_broken_line(self):
+        """Ошибка в строке останавливает загрузку с ее номером."""
+        with open(self.path, 'w', encoding='utf-8') as file:
+            file.write('{"model": "group", "slug": "new", "title": "Н"}\n')
+            file.write('{"model": "post", "author": "author"}\n')
+        with self.assertRaisesMessage(CommandError, 'строка 2: нет поля id'):
+            self.load('--batch-size', '1')
+        self.assertTrue(Group.objects.filter(slug='new').exists())
+
+    def write(self, *rows):
+        with open(self.path, 'w', encoding='utf-8') as file:
+            file.writelines(json.dumps(row, ensure_ascii=False) + '\n'
+                            for row in rows)
+
+    def test_id_conflict(self):
+        """Чужой пост с тем же id не подменяет импортируемый."""
+        self.write(
+            {'model': 'post', 'id': self.post.pk, 'author': 'remote',
+             'text': 'Удаленный пост'},
+            {'model': 'comment', 'id': 100, 'post': self.post.pk,
+             'author': 'remote', 'text': 'Удаленный комментарий'})
+        with self.assertRaisesMessage(
+                CommandError, f'строка 1: id {self.post.pk} уже занят'):
+            self.load()
+        self.assertFalse(Comment.objects.filter(pk=100).exists())
+        self.assertEqual(Post.objects.get(pk=self.post.pk).text,
+                         'Первый пост про котов')
+
+    def test_invalid_references(self):
+        """Комментарий без поста и пустой автор - ошибки с номером строки."""
+        self.write(
+            {'model': 'group', 'slug': 'new', 'title': 'Н'},
+            {'model': 'comment', 'id': 100, 'post': 10 ** 6,
+             'author': 'reader', 'text': 'Комментарий'})
+        with self.assertRaisesMessage(
+                CommandError, 'строка 2: нет поста 1000000. Загружено '
+                              'строк: 1, продолжить можно с --offset 1'):
+            self.load('--batch-size', '1')
+        self.write({'model': 'post', 'id': 10 ** 6, 'author': ''})
+        with self.assertRaisesMessage(CommandError,
+                                      'строка 1: нет поля author'):
+            self.load()
+
+    def test_stopped_import_is_consistent(self):
+        """Пачки до ошибки получают счетчики и новые поколения кэша."""
+        group = Group.objects.get()
+        generations = (generation('index'), generation(f'group:{group.pk}'))
+        self.write(
+            {'model': 'post', 'id': 100, 'author': 'author',
+             'group': 'group', 'text': 'Импортированный пост'},
+            {'model': 'post', 'id': 101, 'author': 'author',
+             'group': 'missing', 'text': 'Пост без группы'})
+        with self.assertRaisesMessage(CommandError, 'нет группы missing'):
+            self.load('--batch-size', '1')
+        group.refresh_from_db()
+        self.assertEqual(group.post_count, 2)
+        self.assertNotEqual(
+            (generation('index'), generation(f'group:{group.pk}')),
+            generations)
+        Post.objects.get(pk=100).delete()
+        group.refresh_from_db()
+        self.assertEqual(group.post_count, 1)
+
+    @unittest.skipUnless(hasattr(sqlite3.Connection, 'setlimit'),
+                         'setlimit появился в Python 3.11')
+    @override_settings(FEED_FANOUT_THRESHOLD=10000)
+    def test_large_batch_fits_old_sqlite_limit(self):
+        """Пачка больше 999 строк грузится при пределе старых SQLite."""
+        count = 1200
+        self.write(*(
+            {'model': 'post', 'id': 1000 + i, 'author': f'user{i}',
+             'text': f'Пост {i}'} for i in range(count)), *(
+            {'model': 'comment', 'id': 1000 + i, 'post': 1000 + i,
+             'author': 'reader', 'text': 'Да'} for i in range(count)), *(
+            {'model': 'follow', 'user': f'user{i}', 'author': 'author'}
+            for i in range(count)))
+        connection.ensure_connection()
+        limit = sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER
+        previous = connection.connection.setlimit(limit, 999)
+        try:
+            self.load('--batch-size', str(3 * count))
+        finally:
+            connection.connection.setlimit(limit, previous)
+        self.assertEqual(Post.objects.count(), count + 2)
+        self.assertEqual(Comment.objects.count(), count + 1)
+        self.assertEqual(Post.objects.get(pk=1000 + count - 1).comment_count,
+                         1)
+        self.assertEqual(FeedEntry.objects.filter(
+            post=self.post).count(), count + 1)
@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post
+from ..utils import CachedCountPaginator, store_count
+
+POSTS_COUNT: int = 45
+User = get_user_model()
+
+
+@override_settings(PAGINATOR_WINDOW=1)
+class CachedCountPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.bulk_create(
+            Post(text=f'Тестовый текст {i}', author=cls.user)
+            for i in range(POSTS_COUNT)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_count_is_cached(self):
+        """Повторный подсчет берется из кэша, а не из COUNT(*)."""
+        CachedCountPaginator(Post.objects.all(), 10).page(1)
+        paginator = CachedCountPaginator(Post.objects.all(), 10)
+        with self.assertNumQueries(1):
+            page = paginator.page(2)
+            self.assertEqual(paginator.count, POSTS_COUNT)
+        self.assertTrue(page.has_next())
+
+    def test_stale_count_is_corrected(self):
+        """Устаревшее количество не ломает пагинацию."""
+        store_count(Post.objects.all(), 1000)
+        paginator = CachedCountPaginator(Post.objects.all(), 10)
+        page = paginator.get_page(50)
+        self.assertEqual(page.number, 5)
+        self.assertEqual(len(page), 5)
+        self.assertEqual(paginator.count, POSTS_COUNT)
+
+        store_count(Post.objects.all(), 1)
+        paginator = CachedCountPaginator(Post.objects.all(), 10)
+        self.assertEqual(len(paginator.get_page(3)), 10)
+        self.assertTrue(paginator.get_page(3).has_next())
+
+    def test_page_window(self):
+        """Шаблон выводит только окно номеров вокруг текущей страницы."""
+        response = self.guest_client.get(reverse('posts:index'), {'page': 3})
+        content = response.content.decode()
+        for number in (2, 3, 4):
+            with self.subTest(number=number):
+                self.assertIn(f'>{number}<', content)
+        self.assertNotIn('?page=1">1<', content)
+        self.assertNotIn('?page=5">5<', content)
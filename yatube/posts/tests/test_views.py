@@ -1,15 +1,18 @@
 import shutil
 import tempfile
+from http import HTTPStatus
+from io import StringIO
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
-from ..models import Follow, Group, Post
+from ..models import Comment, FeedEntry, Follow, Group, Post
 
 TEST_OF_POST: int = 13
 User = get_user_model()
@@ -98,6 +101,61 @@ class PaginatorViewsTests(TestCase):
                 self.assertEqual(count_posts2, 3, error_name2)
 
 
+@override_settings(FEED_PAGINATION='cursor')
+class CursorPaginatorViewsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_group',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create(
+            Post(text=f'Тестовый текст {i}', group=cls.group, author=cls.user)
+            for i in range(TEST_OF_POST)
+        )
+        cls.urls: tuple = (
+            reverse('posts:index'),
+            reverse('posts:profile',
+                    kwargs={'username': cls.user.username}),
+            reverse('posts:group_list',
+                    kwargs={'slug': cls.group.slug}),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_cursor_pages(self):
+        """Токены after/before обходят ленту без пропусков и повторов."""
+        for url in CursorPaginatorViewsTests.urls:
+            with self.subTest(url=url):
+                first = self.guest_client.get(url).context['page_obj']
+                self.assertEqual(len(first), 10)
+                self.assertFalse(first.has_previous())
+                second = self.guest_client.get(
+                    url, {'after': first.next_cursor}).context['page_obj']
+                self.assertEqual(len(second), 3)
+                self.assertFalse(second.has_next())
+                self.assertEqual(
+                    {post.pk for post in first} | {post.pk for post in second},
+                    set(Post.objects.values_list('pk', flat=True))
+                )
+                back = self.guest_client.get(
+                    url, {'before': second.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(back), list(first))
+                self.assertFalse(back.has_previous())
+
+    def test_broken_cursor_returns_first_page(self):
+        """Битый токен возвращает первую страницу."""
+        response = self.guest_client.get(
+            reverse('posts:index'), {'after': 'не-токен'})
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class PostPagesTests(TestCase):
     @classmethod
@@ -154,7 +212,8 @@ class PostPagesTests(TestCase):
 
     @classmethod
     def tearDownClass(cls):
-        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def test_pages_uses_correct_template(self):
         """URL-адрес использует соответствующий шаблон."""
@@ -218,21 +277,65 @@ class PostPagesTests(TestCase):
         self.assertIsInstance(form_field, expected, error_name)
 
     def test_cache_context(self):
-        '''Проверка кэширования страницы index'''
-        before_create_post = self.authorized_client.get(
-            reverse('posts:index'))
-        first_item_before = before_create_post.content
+        '''Лента index кэшируется и сбрасывается при изменении постов'''
+        cache.clear()
+        first = self.authorized_client.get(reverse('posts:index')).content
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
+        cached = self.authorized_client.get(reverse('posts:index')).content
+        self.assertEqual(cached, first)
         Post.objects.create(
             author=self.user,
             text='Проверка кэша',
             group=self.group)
-        after_create_post = self.authorized_client.get(
-            reverse('posts:index'))
-        first_item_after = after_create_post.content
-        self.assertEqual(first_item_after, first_item_before)
+        fresh = self.authorized_client.get(reverse('posts:index')).content
+        self.assertIn('Проверка кэша'.encode(), fresh)
+        self.assertIn('Без сигналов'.encode(), fresh)
+
+    def test_group_cache_follows_post_edit(self):
+        '''Смена группы при редактировании сразу видна в обеих группах'''
+        cache.clear()
+        other = Group.objects.create(title='Другая группа', slug='other',
+                                     description='Описание')
+        old_url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        new_url = reverse('posts:group_list', kwargs={'slug': other.slug})
+        self.authorized_client.get(old_url)
+        self.authorized_client.get(new_url)
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.id}),
+            data={'text': 'Перенесенный пост', 'group': other.id})
+        self.assertNotIn('Перенесенный пост'.encode(),
+                         self.authorized_client.get(old_url).content)
+        self.assertIn('Перенесенный пост'.encode(),
+                      self.authorized_client.get(new_url).content)
+
+    def test_group_fragments_do_not_collide(self):
+        '''Группы с одинаковыми поколениями не делят фрагмент'''
         cache.clear()
-        after_clear = self.authorized_client.get(reverse('posts:index'))
-        self.assertNotEqual(first_item_after, after_clear)
+        other = Group.objects.create(title='Другая группа', slug='other',
+                                     description='Описание')
+        Post.objects.create(author=self.user, text='Пост другой группы',
+                            group=other)
+        for group in (self.group, other):
+            cache.set(f'generation:group:{group.pk}', 1, None)
+        self.guest_client.get(
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}))
+        response = self.guest_client.get(
+            reverse('posts:group_list', kwargs={'slug': other.slug}))
+        self.assertContains(response, 'Пост другой группы')
+        self.assertNotContains(response, self.post.text)
+
+    def test_rename_refreshes_feeds(self):
+        '''Новое имя автора сразу видно в общих лентах'''
+        cache.clear()
+        urls = (reverse('posts:index'), reverse(
+            'posts:group_list', kwargs={'slug': self.group.slug}))
+        for url in urls:
+            self.guest_client.get(url)
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name, user.last_name = 'Новое', 'Имя'
+        user.save()
+        for url in urls:
+            self.assertContains(self.guest_client.get(url), 'Новое Имя')
 
 
 class FollowViewsTest(TestCase):
@@ -244,6 +347,7 @@ class FollowViewsTest(TestCase):
         cls.author = User.objects.create_user(username='someauthor')
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -316,3 +420,137 @@ class FollowViewsTest(TestCase):
             reverse('posts:follow_index'))
         new_post_unfollower = response_unfollower.context['page_obj']
         self.assertNotIn(new_post_follower, new_post_unfollower)
+
+    def test_unfollow_trims_feed(self):
+        '''После отписки посты автора пропадают из ленты подписок'''
+        post = Post.objects.create(author=FollowViewsTest.author,
+                                   text='Текстовый текст')
+        self.authorized_client.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': FollowViewsTest.author.username}))
+        self.assertTrue(FeedEntry.objects.filter(
+            user=FollowViewsTest.user, post=post).exists())
+        self.authorized_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': FollowViewsTest.author.username}))
+        self.assertFalse(FeedEntry.objects.filter(
+            user=FollowViewsTest.user).exists())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertNotIn(post, response.context['page_obj'])
+
+    @override_settings(FEED_FANOUT_THRESHOLD=0)
+    def test_fan_in_author_posts_read_without_entries(self):
+        '''Посты популярного автора не раскладываются, но видны в ленте'''
+        Follow.objects.create(user=FollowViewsTest.user,
+                              author=FollowViewsTest.author)
+        cache.clear()
+        post = Post.objects.create(author=FollowViewsTest.author,
+                                   text='Текстовый текст')
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
+
+    def test_author_leaving_fan_in_keeps_posts(self):
+        '''Посты, опубликованные в fan-in, остаются в ленте после выхода'''
+        with override_settings(FEED_FANOUT_THRESHOLD=1):
+            for user in (FollowViewsTest.user, FollowViewsTest.user2):
+                Follow.objects.create(user=user,
+                                      author=FollowViewsTest.author)
+            post = Post.objects.create(author=FollowViewsTest.author,
+                                       text='Пост популярного автора')
+            self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+            # Отписка возвращает автора к раскладке постов.
+            self.authorized_client2.get(reverse(
+                'posts:profile_unfollow',
+                kwargs={'username': FollowViewsTest.author.username}))
+        self.assertTrue(FeedEntry.objects.filter(
+            user=FollowViewsTest.user, post=post).exists())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
+
+    def test_threshold_change_needs_sync(self):
+        '''После смены порога sync_fan_in дозаполняет ленты'''
+        with override_settings(FEED_FANOUT_THRESHOLD=0):
+            Follow.objects.create(user=FollowViewsTest.user,
+                                  author=FollowViewsTest.author)
+            post = Post.objects.create(author=FollowViewsTest.author,
+                                       text='Пост популярного автора')
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        call_command('sync_fan_in', stdout=StringIO())
+        self.assertTrue(FeedEntry.objects.filter(
+            user=FollowViewsTest.user, post=post).exists())
+
+
+class ConditionalPagesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.post = Post.objects.create(author=cls.author, group=cls.group,
+                                       text='Текст поста')
+        cls.urls = (
+            reverse('posts:group_list', args=[cls.group.slug]),
+            reverse('posts:profile', args=[cls.author.username]),
+            reverse('posts:post_detail', args=[cls.post.pk]),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_not_modified_without_queries(self):
+        """Повторный запрос с ETag получает 304 без запросов к БД."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with self.assertNumQueries(0):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+
+    def test_users_get_separate_etags(self):
+        """Гость и вошедший пользователь получают разные ETag."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                response = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertNotEqual(response['ETag'], etag)
+                self.assertIn('Cookie', response['Vary'])
+
+    def test_changes_refresh_etag(self):
+        """Комментарий и подписка меняют ETag своих страниц."""
+        post_url, profile_url = self.urls[2], self.urls[1]
+        post_etag = self.client.get(post_url)['ETag']
+        profile_etag = self.reader_client.get(profile_url)['ETag']
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Комментарий')
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.client.get(post_url, HTTP_IF_NONE_MATCH=post_etag)
+        self.assertContains(response, 'Комментарий')
+        response = self.reader_client.get(
+            profile_url, HTTP_IF_NONE_MATCH=profile_etag)
+        self.assertContains(response, 'Отписаться')
+
+    def test_reused_address_gets_fresh_etag(self):
+        """Новые автор и группа со старым адресом не получают чужой 304."""
+        group_url, profile_url = self.urls[:2]
+        for url in (group_url, profile_url):
+            self.client.get(url)
+        self.author.delete()
+        self.group.delete()
+        author = User.objects.create_user(username='author')
+        group = Group.objects.create(title='Новая', slug='group',
+                                     description='Описание')
+        etags = {url: self.client.get(url)['ETag']
+                 for url in (group_url, profile_url)}
+        Post.objects.create(author=author, group=group, text='Новый пост')
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.client.get(url, HTTP_IF_NONE_MATCH=etag),
+                    'Новый пост')
@@ -0,0 +1,199 @@
+"""Заранее готовит миниатюры картинок постов.
+
+Без этого sorl создает миниатюру при первом показе страницы: первый
+посетитель после post_create ждет декодирование и сжатие картинки, а два
+воркера могут одновременно делать одну и ту же работу. Здесь все
+варианты (размеры из THUMBNAIL_GEOMETRIES в форматах THUMBNAIL_FORMATS)
+создаются в фоне сразу после сохранения поста.
+
+Фоновый поток читает исходник и пишет результат в хранилище и KVStore,
+а само декодирование и сжатие выполняется в пуле процессов: оно упирается
+в процессор, и потоки одного интерпретатора не заняли бы все ядра.
+"""
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import close_old_connections, connections, transaction
+from PIL import features
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from .encoding import encode_variants, setup_process
+from .models import post_image_storage
+
+logger = logging.getLogger(__name__)
+
+MIME_TYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg', 'PNG': 'image/png'}
+
+_executor = None
+_process_pool = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def get_process_pool():
+    """Пул процессов для сжатия; None, если THUMBNAIL_PROCESSES = 0."""
+    global _process_pool
+    if settings.THUMBNAIL_PROCESSES == 0:
+        return None
+    if _process_pool is None:
+        # spawn, а не fork: веб-сервер многопоточный, а копия процесса
+        # с чужими блокировками и соединениями может зависнуть.
+        _process_pool = ProcessPoolExecutor(
+            max_workers=settings.THUMBNAIL_PROCESSES,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=setup_process,
+        )
+    return _process_pool
+
+
+def thumbnail_formats():
+    """Форматы из THUMBNAIL_FORMATS, которые умеет сохранять Pillow."""
+    return [
+        format_ for format_ in settings.THUMBNAIL_FORMATS
+        if format_ != 'WEBP' or features.check('webp')
+    ]
+
+
+def thumbnail_variants():
+    """Пары (geometry, options) для всех вариантов одной картинки."""
+    return [
+        (geometry, dict(settings.THUMBNAIL_OPTIONS, format=format_))
+        for format_ in thumbnail_formats()
+        for geometry in settings.THUMBNAIL_GEOMETRIES
+    ]
+
+
+def _thumbnail_file(source, geometry, options):
+    # Те же имя и параметры, что вычисляет ThumbnailBackend.get_thumbnail.
+    backend = default.backend
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    filename = backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(filename, default.storage), options
+
+
+def thumbnail_key(name, geometry, options):
+    """Ключ миниатюры в KVStore, как его вычисляет get_thumbnail."""
+    source = ImageFile(name, post_image_storage)
+    return _thumbnail_file(source, geometry, options)[0].key
+
+
+def _create_variants(name):
+    source = ImageFile(name, post_image_storage)
+    pending = []
+    for geometry, options in thumbnail_variants():
+        thumbnail, options = _thumbnail_file(source, geometry, options)
+        if not default.kvstore.get(thumbnail):
+            pending.append((geometry, options, thumbnail))
+    if not pending:
+        return
+    with source.storage.open(name) as file:
+        data = file.read()
+    variants = [(geometry, options) for geometry, options, _ in pending]
+    pool = get_process_pool()
+    if pool is None:
+        size, results = encode_variants(data, variants)
+    else:
+        size, results = pool.submit(encode_variants, data, variants).result()
+    source.set_size(size)
+    default.kvstore.get_or_set(source)
+    for (_, _, thumbnail), (raw, thumbnail_size) in zip(pending, results):
+        # Как и sorl, существующий файл не перезаписываем.
+        if not thumbnail.exists():
+            thumbnail.write(raw)
+        thumbnail.set_size(thumbnail_size)
+        default.kvstore.set(thumbnail, source)
+
+
+def generate_thumbnails(name):
+    """Создает все варианты миниатюр картинки name.
+
+    Блокировка в общем кэше не дает двум воркерам (и двум процессам)
+    обрабатывать одну картинку одновременно. При ошибке попытка
+    повторяется THUMBNAIL_RETRIES раз с растущей паузой. Возвращает True,
+    если миниатюры готовы.
+    """
+    lock = f'thumbnail-lock:{name}'
+    if not cache.add(lock, 1, settings.THUMBNAIL_LOCK_TIMEOUT):
+        logger.debug('Миниатюры %s уже создаются', name)
+        return False
+    try:
+        for attempt in range(settings.THUMBNAIL_RETRIES + 1):
+            if attempt:
+                time.sleep(settings.THUMBNAIL_RETRY_DELAY * 2 ** (attempt - 1))
+            try:
+                _create_variants(name)
+                return True
+            except (FileNotFoundError, SuspiciousFileOperation):
+                # Исходника нет: повторять бесполезно.
+                logger.warning('Нет картинки %s', name)
+                return False
+            except Exception:
+                logger.warning('Не удалось создать миниатюры %s, попытка %d',
+                               name, attempt + 1, exc_info=True)
+        logger.error('Миниатюры %s не созданы', name)
+        return False
+    finally:
+        cache.delete(lock)
+
+
+def generate_in_worker(name):
+    """generate_thumbnails для потока пула: со своим соединением с БД."""
+    close_old_connections()
+    try:
+        return generate_thumbnails(name)
+    finally:
+        connections.close_all()
+
+
+def schedule_thumbnails(name):
+    """Ставит картинку в очередь после фиксации транзакции.
+
+    При THUMBNAIL_WORKERS = 0 миниатюры создаются сразу в текущем потоке.
+    """
+    def submit():
+        if settings.THUMBNAIL_WORKERS:
+            get_executor().submit(generate_in_worker, name)
+        else:
+            generate_thumbnails(name)
+
+    transaction.on_commit(submit)
+
+
+def prefetch_thumbnails(posts):
+    """Одним пакетом загружает миниатюры всех картинок постов.
+
+    После этого {% post_image %} для каждого поста берет значения из памяти
+    процесса, а не ходит в кэш и БД по отдельности.
+    """
+    prefetch = getattr(default.kvstore, 'prefetch', None)
+    if prefetch is None:
+        return
+    prefetch(
+        thumbnail_key(post.image.name, geometry, options)
+        for post in posts if post.image
+        for geometry, options in thumbnail_variants()
+    )
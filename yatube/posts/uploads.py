@@ -0,0 +1,102 @@
+"""Нормализация картинок, загруженных в PostForm.
+
+Фотографии с телефона приходят в десятки мегапикселей и с EXIF, который
+поворачивает картинку только при показе. Здесь до сохранения картинка
+поворачивается по EXIF, теряет метаданные и уменьшается до
+POST_IMAGE_MAX_SIZE: хранилище меньше, а каждое следующее декодирование
+(миниатюры, варианты) дешевле.
+
+Память ограничена независимо от размера загрузки: файлы больше
+FILE_UPLOAD_MAX_MEMORY_SIZE Django пишет на диск, не держа в памяти,
+JPEG декодируется сразу в уменьшенном масштабе (Image.draft), а
+результат пишется в файл, который уходит на диск после того же порога.
+"""
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps, features
+
+# Форматы, в которых картинка сохраняется как есть; остальные -> PNG.
+KEEP_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment', 'photoshop')
+EXIF_ORIENTATION = 0x0112
+# При этих значениях ориентации ширина и высота меняются местами.
+TRANSPOSED = {5, 6, 7, 8}
+
+
+def _needs_work(image, orientation):
+    width, height = settings.POST_IMAGE_MAX_SIZE
+    return (
+        image.width > width or image.height > height
+        or orientation not in (None, 1)
+        or any(key in image.info for key in METADATA_KEYS)
+        or image.format not in KEEP_FORMATS
+    )
+
+
+def _target_format(image):
+    if image.format == 'WEBP' and not features.check('webp'):
+        return 'PNG'
+    return image.format if image.format in KEEP_FORMATS else 'PNG'
+
+
+def normalize_image(uploaded):
+    """Возвращает готовый к сохранению файл вместо загруженного.
+
+    Картинку, с которой ничего делать не нужно (маленькую, без EXIF и
+    метаданных), и анимированные GIF отдает без изменений.
+    """
+    if uploaded.size > settings.POST_IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)s.',
+            code='file_too_large',
+            params={'limit': filesizeformat(
+                settings.POST_IMAGE_MAX_UPLOAD_SIZE)},
+        )
+    uploaded.seek(0)
+    image = Image.open(uploaded)
+    if image.width * image.height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError('Слишком большое разрешение картинки.',
+                              code='too_many_pixels')
+    if getattr(image, 'is_animated', False):
+        uploaded.seek(0)
+        return uploaded
+    orientation = image.getexif().get(EXIF_ORIENTATION)
+    if not _needs_work(image, orientation):
+        uploaded.seek(0)
+        return uploaded
+
+    format_ = _target_format(image)
+    box = settings.POST_IMAGE_MAX_SIZE
+    if orientation in TRANSPOSED:
+        box = box[::-1]
+    icc_profile = image.info.get('icc_profile')
+    # thumbnail() сам вызывает draft(): JPEG декодируется сразу в
+    # уменьшенном масштабе, а не целиком.
+    image.thumbnail(box, Image.LANCZOS)
+    image = ImageOps.exif_transpose(image)
+    if format_ == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    # PNG пишет EXIF из info сам, поэтому оставляем только прозрачность.
+    image.info = {key: value for key, value in image.info.items()
+                  if key == 'transparency'}
+
+    params = {'optimize': True}
+    if format_ in ('JPEG', 'WEBP'):
+        params['quality'] = settings.POST_IMAGE_QUALITY
+    if format_ == 'JPEG':
+        params['progressive'] = True
+    if icc_profile:
+        params['icc_profile'] = icc_profile
+    output = tempfile.SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+    image.save(output, format_, **params)
+    size = output.tell()
+    output.seek(0)
+    name = f'{os.path.splitext(uploaded.name)[0]}.{KEEP_FORMATS[format_]}'
+    return UploadedFile(output, name=name,
+                        content_type=Image.MIME.get(format_), size=size)
@@ -1,7 +1,212 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
+import hashlib
+from collections.abc import Sequence
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+
+def encode_cursor(obj):
+    """Упаковывает ключ (pub_date, id) объекта в непрозрачный токен."""
+    raw = f'{obj.pub_date.isoformat()}|{obj.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Распаковывает токен в (pub_date, id) или возвращает None."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        stamp, pk = raw.decode().split('|')
+        pub_date = parse_datetime(stamp)
+        pk = int(pk)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+def _count_key(queryset):
+    try:
+        sql = str(queryset.order_by().query)
+    except EmptyResultSet:
+        return None
+    return 'count:' + hashlib.md5(sql.encode()).hexdigest()
+
+
+def cached_count(queryset):
+    """Количество строк выборки из кэша.
+
+    Точный COUNT(*) выполняется не чаще раза в PAGINATOR_COUNT_TIMEOUT
+    секунд на одинаковый запрос.
+    """
+    key = _count_key(queryset)
+    if key is None:
+        return 0
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, settings.PAGINATOR_COUNT_TIMEOUT)
+    return count
+
+
+def store_count(queryset, count):
+    """Записывает в кэш точное количество, узнанное без COUNT(*)."""
+    key = _count_key(queryset)
+    if key is not None:
+        cache.set(key, count, settings.PAGINATOR_COUNT_TIMEOUT)
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator, который берет количество записей из кэша.
+
+    Значение в кэше может отставать от таблицы не дольше
+    PAGINATOR_COUNT_TIMEOUT. Страница выбирается с одной лишней строкой,
+    поэтому наличие следующей страницы известно точно, а на последней
+    странице количество уточняется без COUNT(*).
+    """
+
+    @cached_property
+    def count(self):
+        return cached_count(self.object_list)
+
+    def validate_number(self, number):
+        # Верхнюю границу проверяет page(): приблизительному количеству
+        # здесь доверять нельзя.
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('Номер страницы не является числом')
+        if number < 1:
+            raise EmptyPage('Номер страницы меньше 1')
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            # Записи удалили после кэширования: уточняем и отдаем последнюю.
+            self._set_count(self.object_list.count(), exact=True)
+            return self.page(self.num_pages)
+        if len(rows) > self.per_page:
+            rows.pop()
+            self._set_count(max(self.count, bottom + len(rows) + 1))
+        else:
+            self._set_count(bottom + len(rows), exact=True)
+        return self._get_page(rows, number, self)
+
+    def _set_count(self, count, exact=False):
+        if exact and self.__dict__.get('count') != count:
+            store_count(self.object_list, count)
+        self.__dict__['count'] = count
+        self.__dict__.pop('num_pages', None)
+
+
+class CursorPage(Sequence):
+    """Страница курсорной пагинации.
+
+    Повторяет интерфейс Page, который нужен шаблонам, но вместо номеров
+    страниц хранит токены соседних страниц.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, paginator,
+                 next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Пагинация по ключу (pub_date, id).
+
+    Каждая страница - один диапазонный проход по индексу без COUNT(*)
+    и OFFSET, поэтому глубокие страницы стоят столько же, сколько первая.
+    """
+
+    def __init__(self, object_list, per_page):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+
+    @cached_property
+    def count(self):
+        # Считается только если шаблон действительно запросил количество.
+        return cached_count(self.object_list)
+
+    def get_page(self, after=None, before=None):
+        """Возвращает страницу после токена after или перед токеном before.
+
+        Битый токен приводит к первой странице, как и Paginator.get_page.
+        """
+        after = after and decode_cursor(after)
+        before = before and decode_cursor(before)
+        if before and not after:
+            return self._page_before(*before)
+        queryset = self.object_list.order_by('-pub_date', '-pk')
+        if after:
+            pub_date, pk = after
+            queryset = queryset.filter(
+                Q(pub_date__lte=pub_date) & ~Q(pub_date=pub_date, pk__gte=pk)
+            )
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        return CursorPage(
+            rows,
+            self,
+            next_cursor=encode_cursor(rows[-1]) if has_more else None,
+            previous_cursor=encode_cursor(rows[0]) if after and rows else None,
+        )
+
+    def _page_before(self, pub_date, pk):
+        queryset = self.object_list.order_by('pub_date', 'pk').filter(
+            Q(pub_date__gte=pub_date) & ~Q(pub_date=pub_date, pk__lte=pk)
+        )
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        return CursorPage(
+            rows,
+            self,
+            next_cursor=encode_cursor(rows[-1]) if rows else None,
+            previous_cursor=encode_cursor(rows[0]) if has_more else None,
+        )
 
 
 def paginate_page(request, post_list, post_per_page=10):
-    paginator = Paginator(post_list, post_per_page)
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    if after or before or settings.FEED_PAGINATION == 'cursor':
+        paginator = CursorPaginator(post_list, post_per_page)
+        return paginator.get_page(after=after, before=before)
+    paginator = CachedCountPaginator(post_list, post_per_page)
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
@@ -1,37 +1,91 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
 
+from .cache import (conditional_page, feed_cache, group_id_key,
+                    post_author_key, set_last_modified, user_id_key)
+from .feed import follow_feed
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post
-from .utils import paginate_page
+from .models import Comment, Follow, Group, Post
+from .search import SearchPaginator
+from .utils import CursorPaginator, paginate_page
 
 NUMBER_OF_POSTS = 10
 
 
 def index(request):
-    post_list = Post.objects.all()
+    post_list = Post.objects.feed()
     page_obj = paginate_page(request, post_list, NUMBER_OF_POSTS)
     context = {
         'page_obj': page_obj,
+        'feed_cache': feed_cache(request, 'index'),
     }
     return render(request, 'posts/index.html', context)
 
 
+def _lookup(key, queryset):
+    """Одно значение из queryset, запомненное в кэше под key.
+
+    Нужно валидаторам условных ответов: ответ 304 отдается без запросов
+    к БД. Сигналы удаляют ключ при удалении объекта и смене slug или
+    username, иначе новый объект с тем же адресом получал бы ETag из
+    поколений старого.
+    """
+    value = cache.get(key)
+    if value is None:
+        value = queryset.first()
+        if value is not None:
+            cache.set(key, value, settings.FEED_CACHE_TIMEOUT)
+    return value
+
+
+def _group_namespaces(request, slug):
+    group_id = _lookup(group_id_key(slug), Group.objects.filter(
+        slug=slug).values_list('pk', flat=True))
+    return group_id and [f'group:{group_id}']
+
+
+def _profile_namespaces(request, username):
+    author_id = _lookup(user_id_key(username), User.objects.filter(
+        username=username).values_list('pk', flat=True))
+    if author_id is None:
+        return None
+    # Счетчики подписок автора и кнопка подписки зрителя.
+    namespaces = [f'author:{author_id}', f'follow:{author_id}',
+                  f'followers:{author_id}']
+    if request.user.is_authenticated:
+        namespaces.append(f'follow:{request.user.pk}')
+    return namespaces
+
+
+def _post_namespaces(request, post_id):
+    # Автор нужен ради его счетчика постов на странице.
+    author_id = _lookup(post_author_key(post_id), Post.objects.filter(
+        pk=post_id).values_list('author_id', flat=True))
+    return author_id and [f'post:{post_id}', f'author:{author_id}']
+
+
+@conditional_page(_group_namespaces)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
+    post_list = group.posts.feed()
     page_obj = paginate_page(request, post_list, NUMBER_OF_POSTS)
     context = {
         'group': group,
         'page_obj': page_obj,
+        'feed_cache': feed_cache(request, f'group:{group.pk}'),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional_page(_profile_namespaces)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.select_related('group').all()
+    author = get_object_or_404(User.objects.select_related('stats'),
+                               username=username)
+    post_list = author.posts.feed()
     page_obj = paginate_page(request, post_list, NUMBER_OF_POSTS)
     following = (request.user.is_authenticated
                  and Follow.objects.filter(
@@ -40,22 +94,57 @@ def profile(request, username):
     context = {
         'page_obj': page_obj,
         'author': author,
-        'following': following
+        'following': following,
+        'feed_cache': feed_cache(request, f'author:{author.pk}'),
     }
     return render(request, 'posts/profile.html', context)
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    paginator = SearchPaginator(query, NUMBER_OF_POSTS)
+    page_obj = paginator.get_page(after=request.GET.get('after'),
+                                  before=request.GET.get('before'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def comments_page(request, post_id):
+    """Страница комментариев поста с авторами, от новых к старым."""
+    paginator = CursorPaginator(
+        Comment.objects.filter(post_id=post_id).with_author(),
+        settings.COMMENTS_PER_PAGE)
+    return paginator.get_page(after=request.GET.get('after'))
+
+
+@conditional_page(_post_namespaces)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(Post.objects.for_detail(), id=post_id)
 
     form = CommentForm()
+    comments = comments_page(request, post_id)
     context = {
         'post': post,
         'form': form,
         'comments': comments,
     }
-    return render(request, 'posts/post_detail.html', context)
+    return set_last_modified(
+        render(request, 'posts/post_detail.html', context),
+        [post.pub_date, *(comment.pub_date for comment in comments)])
+
+
+def post_comments(request, post_id):
+    """Следующая страница комментариев: фрагмент для подгрузки."""
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    context = {
+        'post_id': post_id,
+        'comments': comments_page(request, post_id),
+    }
+    return render(request, 'posts/includes/comments.html', context)
 
 
 @login_required
@@ -109,10 +198,12 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    posts_list = Post.objects.filter(author__following__user=request.user)
+    posts_list = follow_feed(request.user).feed()
     page_obj = paginate_page(request, posts_list, NUMBER_OF_POSTS)
     context = {
         'page_obj': page_obj,
+        'feed_cache': feed_cache(
+            request, f'follow:{request.user.pk}', 'index'),
     }
     return render(request, 'posts/follow_index.html', context)
 
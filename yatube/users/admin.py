@@ -0,0 +1,17 @@
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+
+from core.admin import PrefixSearchMixin
+
+User = get_user_model()
+
+admin.site.unregister(User)
+
+
+@admin.register(User)
+class UserAdmin(PrefixSearchMixin, BaseUserAdmin):
+    # Пользователей ищут по началу логина: по нему есть индекс, а поиск
+    # по имени и почте перебирал бы всю таблицу.
+    search_fields = ('username',)
+    prefix_search_fields = ('username',)
@@ -36,6 +36,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.QueryCountMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -74,6 +75,22 @@ DATABASES = {
     }
 }
 
+# Параметры каждого соединения с SQLite (core/db.py). WAL снимает
+# блокировку читателей на время записи; остальное - быстрее и безопаснее
+# при нескольких воркерах.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,
+}
+# Как часто (в секундах, на процесс) обновлять статистику планировщика
+# через PRAGMA optimize; None - не обновлять.
+SQLITE_OPTIMIZE_INTERVAL = 60 * 60
+SQLITE_ANALYSIS_LIMIT = 400
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -118,8 +135,85 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Один файл кэша на хост: его делят все WSGI-воркеры (core/cache.py).
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'default.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
     }
 }
+
+# Тесты идут с кэшем в памяти (core/runner.py).
+TEST_RUNNER = 'core.runner.TestRunner'
+
+# Режим пагинации лент: 'page' - номера страниц, 'cursor' - токены
+# ?after=/?before= по ключу (pub_date, id) без COUNT(*) и OFFSET.
+FEED_PAGINATION = 'page'
+
+# Сколько секунд количество записей ленты может браться из кэша
+# и сколько номеров страниц показывать по обе стороны от текущей.
+PAGINATOR_COUNT_TIMEOUT = 60
+PAGINATOR_WINDOW = 3
+
+# Комментарии на странице поста: первые COMMENTS_PER_PAGE выводятся
+# сразу, следующие подгружаются порциями по курсору (pub_date, id).
+COMMENTS_PER_PAGE = 20
+
+# Лента подписок: посты авторов, у которых подписчиков больше порога,
+# не раскладываются по лентам при публикации, а подмешиваются при чтении.
+FEED_FANOUT_THRESHOLD = 1000
+FEED_FAN_IN_CACHE_TIMEOUT = 300
+FEED_BACKFILL_LIMIT = 500
+FEED_BATCH_SIZE = 500
+
+# Счетчик запросов к БД: заголовки X-Query-Count/X-Query-Time в ответе
+# и предупреждение в логе, если запрос к странице дороже порога.
+QUERY_COUNT_HEADERS = DEBUG
+QUERY_COUNT_WARNING = 20
+
+# Время жизни закэшированных фрагментов лент. Устаревание отслеживается
+# поколениями (posts/cache.py), поэтому срок может быть большим.
+FEED_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Миниатюры картинок постов создаются в фоне сразу после сохранения
+# поста (posts/thumbnails.py): каждый размер из THUMBNAIL_GEOMETRIES в каждом
+# формате из THUMBNAIL_FORMATS. Последний формат - запасной для браузеров,
+# не знающих остальные; WebP пропускается, если Pillow собран без него.
+# THUMBNAIL_WORKERS - потоки ввода-вывода (0 - создавать сразу),
+# THUMBNAIL_PROCESSES - процессы для сжатия (None - по числу ядер,
+# 0 - сжимать в том же потоке).
+THUMBNAIL_GEOMETRIES = ['320x113', '640x226', '960x339']
+THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+THUMBNAIL_FORMATS = ['WEBP', 'JPEG']
+THUMBNAIL_SIZES = '(min-width: 992px) 960px, 100vw'
+THUMBNAIL_WORKERS = 2
+THUMBNAIL_PROCESSES = None
+THUMBNAIL_RETRIES = 2
+THUMBNAIL_RETRY_DELAY = 1
+THUMBNAIL_LOCK_TIMEOUT = 60
+
+# Ключи миниатюр читаются пачкой на страницу и держатся в LRU процесса
+# (posts/kvstore.py). Срок в LRU ограничивает, как долго процесс может
+# не замечать удаленную другим процессом миниатюру.
+THUMBNAIL_KVSTORE = 'posts.kvstore.KVStore'
+THUMBNAIL_LRU_SIZE = 10000
+THUMBNAIL_LRU_TIMEOUT = 300
+
+# Загруженные картинки постов поворачиваются по EXIF, теряют метаданные и
+# уменьшаются до POST_IMAGE_MAX_SIZE (posts/uploads.py). Файлы больше
+# FILE_UPLOAD_MAX_MEMORY_SIZE сразу пишутся на диск, а не в память.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 512 * 1024
+POST_IMAGE_MAX_SIZE = (2048, 2048)
+POST_IMAGE_MAX_PIXELS = 50_000_000
+POST_IMAGE_MAX_UPLOAD_SIZE = 25 * 1024 * 1024
+POST_IMAGE_QUALITY = 85
+
+# Картинки постов хранятся по имени содержимого (core/storage.py) и общие
+# для одинаковых загрузок. Файл без ссылок удаляется при удалении поста,
+# если его не сохраняли заново последние MEDIA_RELEASE_GRACE секунд.
+MEDIA_RELEASE_GRACE = 60 * 60
+# Сюда collect_media --quarantine переносит файлы без ссылок.
+MEDIA_QUARANTINE_ROOT = os.path.join(BASE_DIR, 'media_quarantine')